@@ -0,0 +1,70 @@
+from array import array
+
+# Acumulador compacto para (codigo, descripcion) -> cantidad.
+# Antes: un dict por etiqueta con una tupla (codigo, descripcion) nueva por producto y
+# etiqueta, y los mismos textos repetidos en cada etiqueta y cada PDF. Ahora:
+# - Internado: cada (codigo, descripcion) distinto tiene UN id entero y UNA tupla con
+#   los textos compartidos, para todo el lote (INTERNADO: uno por proceso; el catálogo
+#   de productos es finito, así que en el vigilante no crece sin límite).
+# - Acumulador: por etiqueta, ids y cantidades en arrays (sin objetos por producto,
+#   salvo la posición en `slot`). items() da lo mismo que el dict de antes y en el
+#   mismo orden (primera aparición), así que write_db/write_dia_db no cambian.
+# Medido con `python benchmarks.py acumulador`.
+
+class Internado:
+    def __init__(self):
+        self.ids = {}     # (codigo, descripcion) -> id de producto
+        self.pares = []   # id -> (codigo, descripcion) con los textos compartidos
+        self.textos = {}  # texto -> el mismo texto (un objeto por texto distinto)
+
+    def id(self, codigo: str, descripcion: str) -> int:
+        pid = self.ids.get((codigo, descripcion))
+        if pid is None:
+            t = self.textos
+            par = (t.setdefault(codigo, codigo), t.setdefault(descripcion, descripcion))
+            pid = self.ids[par] = len(self.pares)
+            self.pares.append(par)
+        return pid
+
+    def __len__(self) -> int:
+        return len(self.pares)
+
+INTERNADO = Internado()
+
+class Acumulador:
+    __slots__ = ("internado", "slot", "pids", "cantidades")
+
+    def __init__(self, internado: Internado = None):
+        self.internado = internado if internado is not None else INTERNADO
+        self.slot = {}                 # id de producto -> posición en los arrays
+        self.pids = array("q")         # ids en orden de primera aparición
+        self.cantidades = array("q")
+
+    def sumar(self, codigo: str, descripcion: str, cantidad: int):
+        pid = self.internado.id(codigo, descripcion)
+        i = self.slot.get(pid)
+        if i is None:
+            self.slot[pid] = len(self.pids)
+            self.pids.append(pid)
+            self.cantidades.append(cantidad)
+        else:
+            self.cantidades[i] += cantidad
+
+    def __len__(self) -> int:
+        return len(self.pids)
+
+    def items(self):
+        """((codigo, descripcion), cantidad) en orden de primera aparición, como dict.items()."""
+        pares = self.internado.pares
+        return ((pares[pid], cantidad) for pid, cantidad in zip(self.pids, self.cantidades))
+
+    def copia(self) -> "Acumulador":
+        otro = Acumulador(self.internado)
+        otro.slot = dict(self.slot)
+        otro.pids = array("q", self.pids)
+        otro.cantidades = array("q", self.cantidades)
+        return otro
+
+    def a_dict(self) -> dict:
+        # para pasar entre procesos (--page-workers): los ids solo valen en este proceso
+        return dict(self.items())
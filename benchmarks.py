@@ -0,0 +1,382 @@
+import argparse
+import glob
+import json
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import gramatica
+from diagnostico import Diagnostico
+from maquetacion import agrupar_lineas, tolerancia_y
+
+SAMPLES = "pdf-to-sqlite-dia/Tiendas/*/*/pdfs/*.pdf"
+BASE_JSON = "benchmarks_base.json"  # ritmos guardados con --guardar
+UMBRAL_REGRESION = 0.8  # por debajo del 80% del ritmo guardado = regresión
+
+# ---------- parsers de referencia (token-list, como eran antes de gramatica.py) ----------
+def _ref_clean_tokens(tokens):
+    out, prev = [], None
+    for t in tokens:
+        if "..." in t or re.fullmatch(r"\.+", t):
+            continue
+        if t == prev:
+            continue
+        out.append(t)
+        prev = t
+    return out
+
+def ref_parse_side(tokens):
+    # batch_convert.parse_side
+    tokens = _ref_clean_tokens(tokens)
+    code_idx = None
+    for i, t in enumerate(tokens):
+        if t.isdigit() and 3 <= len(t) <= 12:
+            code_idx = i
+            break
+    if code_idx is None:
+        return None
+    codigo = tokens[code_idx]
+    if code_idx + 1 < len(tokens) and tokens[code_idx + 1] == codigo:
+        tokens.pop(code_idx + 1)
+    q_idx = None
+    for i in range(code_idx + 1, len(tokens) - 1):
+        if tokens[i] in ("B", "U") and tokens[i - 1].isdigit() and tokens[i + 1].isdigit():
+            q_idx = i - 1
+            break
+    if q_idx is None:
+        return None
+    cantidad = int(tokens[q_idx])
+    descripcion = " ".join(tokens[code_idx + 1 : q_idx]).strip()
+    if not descripcion:
+        return None
+    return codigo, descripcion, cantidad
+
+def ref_parse_side_rf626a(tokens):
+    # convertir_pdf.parse_side_rf626a
+    tokens = _ref_clean_tokens(tokens)
+    if not tokens:
+        return None
+    code_idx = None
+    for i, t in enumerate(tokens):
+        if t.isdigit() and 2 <= len(t) <= 12:
+            code_idx = i
+            break
+    if code_idx is None:
+        return None
+    codigo = tokens[code_idx]
+    q_idx = None
+    for i in range(code_idx + 2, len(tokens) - 1):
+        if tokens[i] in ("B", "U") and tokens[i - 1].isdigit() and tokens[i + 1].isdigit():
+            q_idx = i - 1
+            break
+    if q_idx is None:
+        return None
+    cantidad = int(tokens[q_idx])
+    descripcion = " ".join(tokens[code_idx + 1 : q_idx]).strip()
+    if not descripcion:
+        return None
+    return codigo, descripcion, cantidad
+
+def ref_parse_side_rf625a(tokens):
+    # cajas_azules.parse_side_rf625a
+    tokens = _ref_clean_tokens(tokens)
+    code_idx = None
+    for i, t in enumerate(tokens):
+        if t.isdigit() and 3 <= len(t) <= 12:
+            code_idx = i
+            break
+    if code_idx is None:
+        return None
+    codigo = tokens[code_idx]
+    fmt_idx = None
+    for i in range(code_idx + 2, len(tokens)):
+        if tokens[i] in ("U", "B") and tokens[i - 1].isdigit():
+            fmt_idx = i
+            break
+    if fmt_idx is None:
+        return None
+    cantidad = int(tokens[fmt_idx - 1])
+    descripcion = " ".join(tokens[code_idx + 1 : fmt_idx - 1]).strip()
+    if not descripcion:
+        return None
+    return codigo, descripcion, cantidad
+
+PARES = (
+    ("packinglist", ref_parse_side, gramatica.PACKINGLIST.parse),
+    ("RF626A", ref_parse_side_rf626a, gramatica.RF626A.parse),
+    ("RF625A", ref_parse_side_rf625a, gramatica.RF625A.parse),
+)
+
+# ---------- datos ----------
+def sides_de_pdfs(paths):
+    """Todas las mitades de línea (listas de tokens) de los PDFs, como las arma extract_items_*."""
+    import fitz  # PyMuPDF
+
+    sides = []
+    for path in paths:
+        doc = fitz.open(path)
+        for page in doc:
+            words = page.get_text("words")
+            split_x = float(page.rect.width) / 2.0
+            for left, right in agrupar_lineas(words, split_x, tolerancia_y(words)):
+                sides.append(left)
+                sides.append(right)
+        doc.close()
+    return sides
+
+def sides_aleatorios(n: int, seed: int = 1):
+    """Mitades de línea sintéticas con los casos raros: puntos, repetidos, B/U sueltas..."""
+    rnd = random.Random(seed)
+    vocab = ["B", "U", "...", ".", "..", "x...y", "1", "12", "123", "297243", "297243",
+             "0", "42", "QUITAESMALT", "ACET", "200ML", "PUR", "1-2005566", "..:"]
+    return [[rnd.choice(vocab) for _ in range(rnd.randint(0, 12))] for _ in range(n)]
+
+# ---------- benchmarks ----------
+def _tiempo(fn, sides, repeticiones):
+    best = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for s in sides:
+            fn(s)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def bench_gramatica(paths, fuzz: int = 20000, repeticiones: int = 5) -> bool:
+    sides = sides_de_pdfs(paths)
+    aleatorios = sides_aleatorios(fuzz)
+    ok = True
+    print(f"{len(paths)} PDFs, {len(sides)} mitades de línea (+{len(aleatorios)} aleatorias)\n")
+    for nombre, ref, nuevo in PARES:
+        distintos = [s for s in sides + aleatorios if ref(list(s)) != nuevo(s)]
+        if distintos:
+            ok = False
+            print(f"❌ {nombre}: {len(distintos)} diferencias, p.ej. {distintos[0]!r}")
+            continue
+        t_ref = _tiempo(ref, sides, repeticiones)
+        t_new = _tiempo(nuevo, sides, repeticiones)
+        diag = Diagnostico()
+        t_diag = _tiempo(lambda s: nuevo(s, diag), sides, repeticiones)
+        print(
+            f"✅ {nombre:<12} idéntico  ref {len(sides) / t_ref:>10,.0f} mitades/s"
+            f"  gramática {len(sides) / t_new:>10,.0f} mitades/s  (x{t_ref / t_new:.2f})"
+            f"  con diagnóstico {len(sides) / t_diag:>10,.0f} mitades/s"
+        )
+    return ok
+
+# ---------- etapas: get_text / agrupado / parse / write_db ----------
+def _mejor(fn, repeticiones):
+    best = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def bench_etapas(paths, repeticiones: int = 5) -> dict:
+    """Cada etapa por separado sobre los mismos PDFs -> {etapa: {métrica: ritmo}}."""
+    import fitz  # PyMuPDF
+    from cabecera import words_text
+    from escritura_db import write_db
+
+    docs = [fitz.open(str(p)) for p in paths]
+    paginas = [page for doc in docs for page in doc]
+    gram = {}
+    for doc in docs:
+        rf625a = "RF625A" in words_text(doc[0].get_text("words"))
+        gram[id(doc)] = gramatica.RF625A if rf625a else gramatica.RF626A
+
+    words = [page.get_text("words") for page in paginas]
+    t_text = _mejor(lambda: [page.get_text("words") for page in paginas], repeticiones)
+
+    tols = [tolerancia_y(w) for w in words]
+    splits = [float(page.rect.width) / 2.0 for page in paginas]
+    agrupar = lambda: [agrupar_lineas(w, x, t) for w, x, t in zip(words, splits, tols)]
+    lineas = agrupar()
+    t_lineas = _mejor(agrupar, repeticiones)
+
+    sides = [(gram[id(page.parent)], side) for page, ls in zip(paginas, lineas) for l in ls for side in l]
+    parse = lambda: [g.parse(side) for g, side in sides]
+    filas = [r for r in parse() if r]
+    t_parse = _mejor(parse, repeticiones)
+
+    acc = {}
+    for codigo, descripcion, cantidad in filas:
+        acc[(codigo, descripcion)] = acc.get((codigo, descripcion), 0) + cantidad
+    with tempfile.TemporaryDirectory() as tmp:
+        out_db = Path(tmp) / "bench.db"
+        t_db = _mejor(lambda: write_db("bench", acc, out_db), repeticiones)
+
+    for doc in docs:
+        doc.close()
+    n = len(paginas)
+    return {
+        "get_text": {"paginas_s": n / t_text},
+        "agrupar_lineas": {"paginas_s": n / t_lineas},
+        "parse_side": {"paginas_s": n / t_parse, "filas_s": len(filas) / t_parse},
+        "write_db": {"filas_s": len(acc) / t_db},
+    }
+
+# ---------- acumulador: memoria y objetos por item ----------
+def _con_dicts(sides):
+    # como era: un dict por etiqueta con una tupla (codigo, descripcion) por producto
+    por_etiqueta = defaultdict(lambda: defaultdict(int))
+    for etq, g, side in sides:
+        r = g.parse(side)
+        if r:
+            codigo, descripcion, cantidad = r
+            por_etiqueta[etq][(codigo, descripcion)] += cantidad
+    return por_etiqueta
+
+def _con_acumulador(sides):
+    from acumulador import Acumulador, Internado
+
+    internado = Internado()  # uno nuevo: su memoria también cuenta
+    por_etiqueta = defaultdict(lambda: Acumulador(internado))
+    for etq, g, side in sides:
+        r = g.parse(side)
+        if r:
+            por_etiqueta[etq].sumar(*r)
+    return por_etiqueta
+
+def _memoria(fn, sides):
+    """-> (resultado, bytes retenidos, pico de bytes, bloques vivos) de fn(sides)."""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    bloques0 = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        resultado = fn(sides)
+        actual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    return resultado, actual, pico, sys.getallocatedblocks() - bloques0
+
+def bench_acumulador(paths, repeticiones: int = 5) -> bool:
+    """
+    Parse + acumulación de todos los PDFs como un lote (un acumulador por etiqueta):
+    dicts de tuplas contra acumulador.Acumulador. Memoria retenida y pico (tracemalloc),
+    bloques vivos por item (objetos que quedan) y ritmo. False si no dan lo mismo.
+    """
+    import fitz  # PyMuPDF
+    from cabecera import words_text
+    from convertir_pdf import RE_ETIQUETA
+
+    sides = []  # (etiqueta, gramática, mitad) de todo el lote, ya extraídas
+    for i, path in enumerate(paths):
+        with fitz.open(str(path)) as doc:
+            for page in doc:
+                words = page.get_text("words")
+                texto = words_text(words)
+                g = gramatica.RF625A if "RF625A" in texto else gramatica.RF626A
+                m = RE_ETIQUETA.search(texto)
+                etq = m.group(1) if m else f"pdf{i}"
+                for linea in agrupar_lineas(words, float(page.rect.width) / 2.0, tolerancia_y(words)):
+                    sides.extend((etq, g, side) for side in linea)
+
+    items = sum(1 for _, g, side in sides if g.parse(side))
+    print(f"{len(paths)} PDFs, {items:,} items\n")
+    resultados = {}
+    for nombre, fn in (("dicts", _con_dicts), ("acumulador", _con_acumulador)):
+        por_etiqueta, actual, pico, bloques = _memoria(fn, sides)
+        t = _mejor(lambda: fn(sides), repeticiones)
+        resultados[nombre] = {etq: list(acc.items()) for etq, acc in por_etiqueta.items()}
+        productos = sum(len(acc) for acc in por_etiqueta.values())
+        print(
+            f"{nombre:<11} {len(por_etiqueta):>5} etiquetas {productos:>8,} productos"
+            f"  retenido {actual / 1024:>9,.0f} KB ({actual / items:>6.1f} B/item)"
+            f"  pico {pico / 1024:>9,.0f} KB"
+            f"  objetos vivos {bloques:>8,} ({bloques / items:.3f}/item)"
+            f"  {items / t:>10,.0f} items/s"
+        )
+    ok = resultados["dicts"] == resultados["acumulador"]
+    print(f"\n{'✅ mismo resultado y orden' if ok else '❌ el acumulador no da lo mismo'}")
+    return ok
+
+def comparar(actual: dict, base: dict) -> bool:
+    """Imprime ritmos (y % contra la base); False si alguna etapa baja de UMBRAL_REGRESION."""
+    ok = True
+    for etapa, metricas in actual.items():
+        for metrica, ritmo in metricas.items():
+            previo = base.get(etapa, {}).get(metrica)
+            linea = f"{etapa:<15} {ritmo:>12,.0f} {metrica.replace('_s', '/s'):<10}"
+            if previo:
+                r = ritmo / previo
+                marca = "✅" if r >= UMBRAL_REGRESION else "❌ regresión"
+                ok &= r >= UMBRAL_REGRESION
+                linea += f"  base {previo:>12,.0f}  ({r - 1:+.0%}) {marca}"
+            print(linea)
+    return ok
+
+def _pdfs_sinteticos(carpeta: Path, formato: str, n: int, paginas: int):
+    import generar_pdfs
+
+    paths = []
+    for i in range(n):
+        path = carpeta / f"{formato}_{i}.pdf"
+        kwargs = {"etiquetas": max(1, paginas // 5)} if formato == "RF626A" else {}
+        generar_pdfs.GENERADORES[formato](path, paginas=paginas, seed=i + 1, **kwargs)
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks del parser")
+    parser.add_argument("bench", choices=("gramatica", "etapas", "acumulador"))
+    parser.add_argument("pdfs", nargs="*", help=f"PDFs (por defecto {SAMPLES}; en etapas/acumulador, sintéticos)")
+    parser.add_argument("--fuzz", type=int, default=20000, help="mitades aleatorias extra a comparar")
+    parser.add_argument("--formato", choices=("RF626A", "RF625A"), default="RF626A",
+                        help="etapas/acumulador: formato de los PDFs sintéticos")
+    parser.add_argument("--paginas", type=int, default=50, help="etapas/acumulador: páginas por PDF sintético")
+    parser.add_argument("-n", type=int, default=4, help="etapas/acumulador: cuántos PDFs sintéticos")
+    parser.add_argument("--base", type=Path, default=Path(__file__).parent / BASE_JSON,
+                        help="etapas: ritmos de referencia")
+    parser.add_argument("--guardar", action="store_true", help="etapas: guardar estos ritmos como base")
+    parser.add_argument("--repeticiones", type=int, default=5, help="etapas/acumulador: se queda con la mejor")
+    args = parser.parse_args(argv)
+
+    if args.bench == "gramatica":
+        paths = args.pdfs or sorted(glob.glob(str(Path(__file__).parent / SAMPLES)))
+        ok = bench_gramatica(paths, args.fuzz)
+        return 0 if ok else 1
+
+    if args.bench == "acumulador":
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = args.pdfs or _pdfs_sinteticos(Path(tmp), args.formato, args.n, args.paginas)
+            ok = bench_acumulador(paths, args.repeticiones)
+        return 0 if ok else 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.pdfs:
+            paths, clave = args.pdfs, "etapas|" + ",".join(sorted(Path(p).name for p in args.pdfs))
+        else:
+            paths = _pdfs_sinteticos(Path(tmp), args.formato, args.n, args.paginas)
+            clave = f"etapas|{args.formato}|{args.n}x{args.paginas}"
+        print(f"{len(paths)} PDFs ({clave})\n")
+        actual = bench_etapas(paths, args.repeticiones)
+
+    try:
+        bases = json.loads(args.base.read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        bases = {}
+    ok = comparar(actual, bases.get(clave, {}).get("ritmos", {}))
+
+    if args.guardar:
+        bases[clave] = {
+            "ritmos": actual,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "maquina": f"{platform.node()} / Python {platform.python_version()}",
+        }
+        args.base.write_text(json.dumps(bases, indent=1, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 base guardada en {args.base}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import re
+
+from plantillas import FORMATOS_CANTIDAD
+
+# Cabecera (tienda, fecha, etiqueta, albarán) sin pasar regex por la página entera.
+# Los campos están siempre en la banda de arriba, antes de la primera línea de
+# producto: esa banda se aprende por formato/tamaño (en el mismo almacén que las
+# columnas, plantillas_columnas.json) y solo se miran las words que caen dentro.
+# Además se recuerda dónde estaba la etiqueta (índice y caja de la word): si en la
+# página siguiente esa word sigue ahí, la página no hace nada de cabecera.
+RE_VALOR = re.compile(r"\d{5,}")  # una etiqueta (número de 5+ cifras) en el mismo hueco
+
+def words_text(words) -> str:
+    # texto plano rearmado desde get_text("words") (una línea por bloque/línea),
+    # para no pasar la página dos veces por el motor de texto
+    lines, key = [], None
+    for x0, y0, x1, y1, w, b, l, wn in words:
+        if (b, l) != key:
+            lines.append([])
+            key = (b, l)
+        lines[-1].append(w)
+    return "\n".join(" ".join(ws) for ws in lines)
+
+def aprender_banda(words, tol: float):
+    """y máximo de la cabecera: justo encima de la primera línea de producto (token B/U)."""
+    ys = [w[1] for w in words if w[4] in FORMATOS_CANTIDAD]
+    return min(ys) - tol if ys else None
+
+class Cabecera:
+    """
+    Una por documento. formato: clave de la plantilla; re_etiqueta: regex
+    precompilada con la etiqueta en el grupo 1 (None si el formato no tiene
+    etiqueta por página); plantillas_col: plantillas.Plantillas o None.
+    """
+    def __init__(self, formato: str, re_etiqueta=None, etiqueta_defecto: str = "",
+                 plantillas_col=None):
+        self.formato = formato
+        self.re_etiqueta = re_etiqueta
+        self.etiqueta_defecto = etiqueta_defecto
+        self.col = plantillas_col
+        self.y_max = None      # banda de cabecera para este documento
+        self.anterior = None   # (índice, bbox) de la etiqueta en la página anterior
+        self.ultima = None
+        self.saltadas = 0      # páginas sin regex de cabecera
+
+    def _clave(self, page) -> str:
+        return f"cabecera|{self.formato}|{round(page.rect.width)}x{round(page.rect.height)}"
+
+    def _banda(self, page, words, tol):
+        if self.y_max is None and self.col is not None:
+            guardado = self.col.datos.get(self._clave(page))
+            if guardado is not None:
+                self.y_max = guardado["y_max"]
+        if self.y_max is None:
+            self._reaprender(page, words, tol)
+        return self.y_max
+
+    def _reaprender(self, page, words, tol) -> bool:
+        """Banda desde esta página; False si no cambia (o no hay productos)."""
+        nueva = aprender_banda(words, tol)
+        if nueva is None or nueva == self.y_max:
+            return False
+        self.y_max = nueva
+        if self.col is not None:
+            self.col.recordar(self._clave(page), {"y_max": nueva})
+        return True
+
+    def _recorte(self, page, words, tol):
+        y_max = self._banda(page, words, tol)
+        if y_max is None:  # página sin productos: toda la página es cabecera
+            return list(enumerate(words))
+        return [(i, w) for i, w in enumerate(words) if w[3] <= y_max]
+
+    def texto(self, page, words, tol, requiere=None) -> str:
+        """
+        Texto de la cabecera recortada. requiere: regex precompilada que tiene que
+        estar en la banda; si no está, se reaprende la banda con esta página y, si
+        aun así falta, se devuelve el texto de la página entera (como antes).
+        """
+        texto = words_text([w for _, w in self._recorte(page, words, tol)])
+        if requiere is None or requiere.search(texto):
+            return texto
+        if self._reaprender(page, words, tol):
+            texto = words_text([w for _, w in self._recorte(page, words, tol)])
+            if requiere.search(texto):
+                return texto
+        return words_text(words)
+
+    def etiqueta(self, page, words, tol) -> str:
+        if self.anterior is not None:
+            i, bbox = self.anterior
+            if i < len(words) and tuple(words[i][:4]) == bbox:
+                etq = words[i][4]
+                # misma etiqueta, o una nueva en el mismo hueco (misma maquetación)
+                if etq == self.ultima or RE_VALOR.fullmatch(etq):
+                    self.saltadas += 1
+                    self.ultima = etq
+                    return etq
+
+        recorte = self._recorte(page, words, tol)
+        m = self.re_etiqueta.search(words_text([w for _, w in recorte]))
+        if m is None and self._reaprender(page, words, tol):
+            recorte = self._recorte(page, words, tol)
+            m = self.re_etiqueta.search(words_text([w for _, w in recorte]))
+        if m is None:
+            self.anterior = None
+            m = self.re_etiqueta.search(words_text(words))
+            return m.group(1) if m else self.etiqueta_defecto
+
+        etq = m.group(1)
+        self.anterior = next(((i, tuple(w[:4])) for i, w in recorte if w[4] == etq), None)
+        self.ultima = etq
+        return etq
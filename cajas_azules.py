@@ -1,13 +1,21 @@
 import re
-import sqlite3
 from datetime import datetime
-from collections import defaultdict
 from pathlib import Path
 import fitz  # PyMuPDF
 
+import cli
+import gramatica
+import plantillas
+from acumulador import Acumulador
+from cabecera import Cabecera, words_text
+from escritura_db import write_db, write_db_incremental
+from flujo import en_fondo
+from maquetacion import agrupar_lineas, tolerancia_y
+from metricas import SIN_METRICAS
+
 # ==== CONFIG ====
-TOL_Y = 2.0
 TIENDAS_PREF = {"14140", "14102", "14017", "14196", "14043"}  # solo para “orden”, no limita
+PARSER_VERSION = "rf625a-3"  # subir si cambia el parsing: invalida el registro de ingesta
 
 # ---------- selectors (Windows) ----------
 def pick_files_and_folder():
@@ -31,12 +39,17 @@ def pick_files_and_folder():
     return list(pdfs), Path(out_dir)
 
 # ---------- header parsers ----------
+RE_TIENDA = re.compile(r"TIENDA/CONCESION\.\.\:\s*(\d{5})")
+RE_FECHA = re.compile(r"Fecha\s*\.\.\:\s*(\d{1,2})/(\d{1,2})/(\d{2})")
+RE_ALBARAN = re.compile(r"NUMERO DE ALBARAN\s*\.*:\s*([0-9]+\s*-\s*[0-9]+)")
+RE_BLANCOS = re.compile(r"\s+")
+
 def get_tienda(text: str) -> str:
-    m = re.search(r"TIENDA/CONCESION\.\.\:\s*(\d{5})", text)
+    m = RE_TIENDA.search(text)
     return m.group(1) if m else "00000"
 
 def get_fecha(text: str) -> str:
-    m = re.search(r"Fecha\s*\.\.\:\s*(\d{1,2})/(\d{1,2})/(\d{2})", text)
+    m = RE_FECHA.search(text)
     if not m:
         return datetime.now().strftime("%Y-%m-%d")
     d, mo, yy = map(int, m.groups())
@@ -44,131 +57,92 @@ def get_fecha(text: str) -> str:
 
 def get_albaran(text: str) -> str:
     # Ej: "NUMERO DE ALBARAN ..........: 0- 610268"
-    m = re.search(r"NUMERO DE ALBARAN\s*\.*:\s*([0-9]+\s*-\s*[0-9]+)", text)
+    m = RE_ALBARAN.search(text)
     if not m:
         return "0-000000"
-    return re.sub(r"\s+", "", m.group(1))  # "0-610268"
+    return RE_BLANCOS.sub("", m.group(1))  # "0-610268"
 
 def is_rf625a(text: str) -> bool:
     # ayuda para no mezclar con otros reportes
     return ("RF625A" in text) or ("LISTADO CAJAS" in text.upper())
 
 # ---------- token parsing (RF625A) ----------
-def clean_tokens(tokens):
-    out, prev = [], None
-    for t in tokens:
-        if "..." in t or re.fullmatch(r"\.+", t):
-            continue
-        if t == prev:
-            continue
-        out.append(t)
-        prev = t
-    return out
-
-def parse_side_rf625a(tokens):
+def parse_side_rf625a(tokens, diag=None):
     """
     RF625A: CODIGO ... CANTIDAD FORMATO (U/B)
     Ej: 297243 ... 1 U
     """
-    tokens = clean_tokens(tokens)
-
-    code_idx = None
-    for i, t in enumerate(tokens):
-        if t.isdigit() and 3 <= len(t) <= 12:
-            code_idx = i
-            break
-    if code_idx is None:
-        return None
-
-    codigo = tokens[code_idx]
-
-    fmt_idx = None
-    for i in range(code_idx + 2, len(tokens)):
-        if tokens[i] in ("U", "B") and tokens[i - 1].isdigit():
-            fmt_idx = i
-            break
-    if fmt_idx is None:
-        return None
-
-    cantidad = int(tokens[fmt_idx - 1])
-    descripcion = " ".join(tokens[code_idx + 1 : fmt_idx - 1]).strip()
-    if not descripcion:
-        return None
-
-    return codigo, descripcion, cantidad
-
-def extract_items_rf625a(page):
-    words = page.get_text("words")
-    width = float(page.rect.width)
-    split_x = width / 2.0
-
-    line_groups = defaultdict(list)
-    for x0, y0, x1, y1, w, b, l, wn in words:
-        key = round(y0 / TOL_Y) * TOL_Y
-        line_groups[key].append((x0, w))
-
+    return gramatica.RF625A.parse(tokens, diag)
+
+def extract_items_rf625a(page, words=None, tol=None, split_x=None, metricas=SIN_METRICAS):
+    if words is None:
+        words = page.get_text("words")
+    if tol is None:
+        tol = tolerancia_y(words)
+    if split_x is None:  # sin plantilla: mitad de la página (el código derecho empieza justo ahí)
+        split_x = float(page.rect.width) / 2.0
+
+    diag = metricas.diag  # None salvo --diagnostico
+    if diag is not None:
+        diag.pagina = page.number
+    with metricas.etapa("agrupar"):
+        lineas = agrupar_lineas(words, split_x, tol)
     items = []
-    for ykey in sorted(line_groups.keys()):
-        pairs = sorted(line_groups[ykey], key=lambda p: p[0])
-        left = [w for x, w in pairs if x < split_x]
-        right = [w for x, w in pairs if x >= split_x]
-
-        for side in (left, right):
-            parsed = parse_side_rf625a(side)
-            if parsed:
-                items.append(parsed)
+    with metricas.etapa("parse"):
+        for left, right in lineas:
+            for side in (left, right):
+                parsed = parse_side_rf625a(side, diag)
+                if parsed:
+                    items.append(parsed)
+    metricas.contar("lineas", len(lineas))
+    metricas.contar("items", len(items))
     return items
 
-# ---------- DB schema ----------
-def ensure_schema(cur):
-    cur.execute("CREATE TABLE IF NOT EXISTS Etiqueta (Etiqueta TEXT PRIMARY KEY)")
-    cur.execute("CREATE TABLE IF NOT EXISTS Codigo (Codigo TEXT PRIMARY KEY)")
-    cur.execute("CREATE TABLE IF NOT EXISTS Descripcion (Descripcion TEXT PRIMARY KEY)")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS Linea (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            Etiqueta TEXT NOT NULL,
-            Codigo TEXT NOT NULL,
-            Descripcion TEXT NOT NULL,
-            Cantidad INTEGER NOT NULL,
-            Falta INTEGER DEFAULT 0
-        )
-    """)
-
-def write_db(etiqueta, acc, out_db_path: Path):
-    conn = sqlite3.connect(out_db_path)
-    cur = conn.cursor()
-    ensure_schema(cur)
-
-    cur.execute("DELETE FROM Linea")
-    cur.execute("DELETE FROM Etiqueta")
-    cur.execute("DELETE FROM Codigo")
-    cur.execute("DELETE FROM Descripcion")
-
-    cur.execute("INSERT INTO Etiqueta (Etiqueta) VALUES (?)", (etiqueta,))
-
-    for (codigo, descripcion), cantidad in acc.items():
-        cur.execute("INSERT OR IGNORE INTO Codigo (Codigo) VALUES (?)", (codigo,))
-        cur.execute("INSERT OR IGNORE INTO Descripcion (Descripcion) VALUES (?)", (descripcion,))
-        cur.execute(
-            "INSERT INTO Linea (Etiqueta, Codigo, Descripcion, Cantidad, Falta) VALUES (?, ?, ?, ?, 0)",
-            (etiqueta, codigo, descripcion, cantidad),
-        )
-
-    conn.commit()
-    conn.close()
-
 # ---------- process one pdf ----------
-def process_pdf(pdf_path: Path, out_root: Path):
-    doc = fitz.open(str(pdf_path))
-    first_text = doc[0].get_text("text") or ""
+def process_pdf(pdf_path: Path, out_root: Path, incremental: bool = False, metricas=SIN_METRICAS):
+    with metricas.etapa("abrir"):
+        doc = fitz.open(str(pdf_path))
+    try:
+        return process_doc(doc, pdf_path, out_root, incremental=incremental, metricas=metricas)
+    finally:
+        if not doc.is_closed:  # process_doc lo cierra al terminar la extracción
+            doc.close()
+
+def _mover_pdf(pdf_path: Path, dest_pdf: Path, metricas=SIN_METRICAS) -> bool:
+    # True si el PDF salió de la entrada (movido, no copiado)
+    with metricas.etapa("mover"):
+        if pdf_path.resolve() == dest_pdf.resolve():
+            return False
+        try:
+            pdf_path.replace(dest_pdf)
+            return True
+        except Exception:
+            import shutil
+            shutil.copy2(pdf_path, dest_pdf)
+        return False
+
+def process_doc(doc, pdf_path: Path, out_root: Path, first_words=None, incremental: bool = False,
+                metricas=SIN_METRICAS):
+    # doc ya abierto (despachador): first_words = words de la página 0 si ya se sacaron;
+    # se cierra en cuanto termina la extracción, para poder mover el PDF
+    # incremental: si el .db ya existe solo se aplica el delta y Falta se conserva
+    # metricas: metricas.Metricas para tiempos por etapa y contadores (--metricas)
+    if first_words is None:
+        with metricas.etapa("texto"):
+            first_words = doc[0].get_text("words")
+    first_text = words_text(first_words)
 
     if not is_rf625a(first_text):
         return {"ok": False, "reason": "No parece RF625A / cajas azules", "pdf": pdf_path.name}
 
-    tienda = get_tienda(first_text)
-    fecha = get_fecha(first_text)
-    albaran = get_albaran(first_text)
+    # tienda/fecha/albarán: solo la banda de cabecera de la página 0
+    tol = tolerancia_y(first_words)  # una tolerancia de líneas por documento
+    col = plantillas.abrir(out_root)
+    with metricas.etapa("cabecera"):
+        cab_text = Cabecera("RF625A", plantillas_col=col).texto(doc[0], first_words, tol, requiere=RE_ALBARAN)
+        tienda = get_tienda(cab_text)
+        fecha = get_fecha(cab_text)
+        albaran = get_albaran(cab_text)
 
     # “Etiqueta” interna para que tu app lo lea igual
     etiqueta = f"{tienda}_{albaran}"
@@ -180,23 +154,43 @@ def process_pdf(pdf_path: Path, out_root: Path):
     pdfs_folder.mkdir(parents=True, exist_ok=True)
     db_folder.mkdir(parents=True, exist_ok=True)
 
-    acc = defaultdict(int)
+    acc = Acumulador()
     for page in doc:
-        for codigo, descripcion, cantidad in extract_items_rf625a(page):
-            acc[(codigo, descripcion)] += cantidad
-
-    # mover PDF a destino
+        if page.number == 0:
+            words = first_words
+        else:
+            with metricas.etapa("texto"):
+                words = page.get_text("words")
+        with metricas.etapa("plantilla"):
+            split_x = col.split_x("RF625A", page, words, tol)
+        metricas.contar("paginas")
+        for codigo, descripcion, cantidad in extract_items_rf625a(page, words, tol, split_x, metricas):
+            acc.sumar(codigo, descripcion, cantidad)
+    col.guardar()
+    metricas.contar("productos", len(acc))
+
+    # mover PDF a destino mientras se escribe la DB; solo con el doc ya cerrado
+    # (en Windows MuPDF lo abre sin FILE_SHARE_DELETE y el rename fallaría)
+    doc.close()
     dest_pdf = pdfs_folder / pdf_path.name
-    if pdf_path.resolve() != dest_pdf.resolve():
-        try:
-            pdf_path.replace(dest_pdf)
-        except Exception:
-            import shutil
-            shutil.copy2(pdf_path, dest_pdf)
+    mover = en_fondo(_mover_pdf, pdf_path, dest_pdf, metricas)
 
     # DB con fecha + albarán (y tienda)
     out_db = db_folder / f"cajas_azules_{tienda}_{fecha}_alb_{albaran}.db"
-    write_db(etiqueta, acc, out_db)
+    try:
+        with metricas.etapa("escribir_db"):
+            if not incremental:
+                write_db(etiqueta, acc, out_db)
+            elif not write_db_incremental(etiqueta, acc, out_db):
+                metricas.contar("dbs_sin_cambios")
+        mover.result()
+    except BaseException:
+        # sin su DB el PDF vuelve a la entrada, como en proceso.process_doc
+        if mover.exception() is None and mover.result():
+            dest_pdf.replace(pdf_path)
+        raise
+    metricas.contar("dbs")
+    metricas.contar("db_bytes", out_db.stat().st_size)
 
     return {
         "ok": True,
@@ -209,26 +203,16 @@ def process_pdf(pdf_path: Path, out_root: Path):
     }
 
 def main():
-    pdfs, out_root = pick_files_and_folder()
-    if not pdfs or out_root is None:
-        print("Cancelado.")
-        return
-
-    print(f"\n📁 DESTINO: {out_root}\n")
-
-    for p in pdfs:
-        r = process_pdf(Path(p), out_root)
-        if not r["ok"]:
-            print(f"⚠️  {r['pdf']} -> {r['reason']}")
-            continue
-
-        print(f"✅ {Path(r['pdf_saved']).name}  ->  Tienda_{r['tienda']}/{r['fecha']}")
-        print(f"   🗃️ {Path(r['db_saved']).name}  ({r['productos']} productos)")
-        print()
-
-    print("Listo.")
+    # sin argumentos de GUI no se toca tkinter: ver `python cajas_azules.py --help`
+    return cli.main(
+        descripcion="Cajas azules RF625A -> SQLite",
+        formato="RF625A",
+        process_pdf=process_pdf,
+        parser_version=PARSER_VERSION,
+        pick=pick_files_and_folder,
+    )
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
 
 
@@ -0,0 +1,268 @@
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import cli
+from lote import bloqueo
+
+# Catálogo de todo el árbol de salida, en la raíz (al lado de registro_ingesta.db):
+# qué producto salió en qué tienda/día/etiqueta sin abrir los .db uno a uno.
+# - Archivo: cada .db indexado con su mtime/tamaño; uno que no cambió no se relee.
+# - Producto: (Codigo, Descripcion) una vez, con FTS5 sobre Descripcion si el sqlite
+#   de Python lo trae (si no, las búsquedas por texto van con LIKE).
+# - Origen: cada etiqueta de cada tienda/día (de qué archivo sale), índice por tienda/fecha.
+# - Aparicion: producto x origen con la cantidad, solo enteros y ordenada por producto
+#   (WITHOUT ROWID): "dónde salió este código" es un rango de la clave primaria.
+# Lo actualiza cli.main / vigilante con las DBs de cada PDF según salen (solo el
+# proceso padre, como el registro); `python catalogo.py sincronizar` lo pone al día
+# con lo que haya en disco (DBs borradas o escritas sin pasar por la CLI).
+CATALOGO_DB = "catalogo.db"
+PATRONES = ("packinglist_*.db", "cajas_azules_*.db", "dia.db")  # conciliacion.db no
+
+def _formato(db: Path) -> str:
+    return "RF625A" if db.name.startswith("cajas_azules_") else "RF626A"
+
+def consulta_fts(texto: str):
+    """
+    Texto del usuario -> consulta FTS5 sin sintaxis: cada palabra entre comillas
+    ("B&W", "FRESA/COCO", "L-CASEI" o 'GEL"' son texto, no operadores) y un "*"
+    final de palabra se deja como prefijo. None si no queda ninguna palabra.
+    """
+    partes = []
+    for palabra in texto.split():
+        prefijo = palabra.endswith("*")
+        palabra = palabra.rstrip("*")
+        if palabra:
+            partes.append('"' + palabra.replace('"', '""') + '"' + ("*" if prefijo else ""))
+    return " ".join(partes) or None
+
+def _borrar_origenes(cur, donde: str, args):
+    origenes = "SELECT id FROM Origen WHERE " + donde
+    cur.executemany(f"DELETE FROM Aparicion WHERE origen IN ({origenes})", args)
+    cur.executemany(f"DELETE FROM Origen WHERE {donde}", args)
+
+class Catalogo:
+    def __init__(self, out_root: Path):
+        self.out_root = Path(out_root)
+        self.out_root.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.out_root / CATALOGO_DB), isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL")  # consultas mientras el lote escribe
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS Archivo (
+                id INTEGER PRIMARY KEY,
+                ruta TEXT NOT NULL UNIQUE,
+                mtime_ns INTEGER NOT NULL,
+                bytes INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS Producto (
+                id INTEGER PRIMARY KEY,
+                Codigo TEXT NOT NULL,
+                Descripcion TEXT NOT NULL,
+                UNIQUE (Codigo, Descripcion)
+            );
+            CREATE TABLE IF NOT EXISTS Origen (
+                id INTEGER PRIMARY KEY,
+                archivo INTEGER NOT NULL REFERENCES Archivo (id),
+                Tienda TEXT NOT NULL,
+                Fecha TEXT NOT NULL,
+                Formato TEXT NOT NULL,
+                Etiqueta TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_Origen_tienda ON Origen (Tienda, Fecha, Etiqueta);
+            CREATE INDEX IF NOT EXISTS idx_Origen_fecha ON Origen (Fecha);
+            CREATE INDEX IF NOT EXISTS idx_Origen_archivo ON Origen (archivo);
+            CREATE TABLE IF NOT EXISTS Aparicion (
+                producto INTEGER NOT NULL REFERENCES Producto (id),
+                origen INTEGER NOT NULL REFERENCES Origen (id),
+                Cantidad INTEGER NOT NULL,
+                PRIMARY KEY (producto, origen)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_Aparicion_origen ON Aparicion (origen);
+        """)
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS ProductoFTS USING fts5("
+                "Descripcion, content='Producto', content_rowid='id')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False  # sqlite sin FTS5
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- indexar ----------
+    def _ruta(self, db: Path) -> str:
+        return Path(db).resolve().relative_to(self.out_root.resolve()).as_posix()
+
+    def _producto(self, cur, codigo, descripcion, ids):
+        pid = ids.get((codigo, descripcion))
+        if pid is None:
+            cur.execute("INSERT OR IGNORE INTO Producto (Codigo, Descripcion) VALUES (?, ?)", (codigo, descripcion))
+            if cur.rowcount > 0:
+                pid = cur.lastrowid
+                if self.fts:
+                    cur.execute("INSERT INTO ProductoFTS (rowid, Descripcion) VALUES (?, ?)", (pid, descripcion))
+            else:
+                pid = cur.execute(
+                    "SELECT id FROM Producto WHERE Codigo = ? AND Descripcion = ?", (codigo, descripcion)
+                ).fetchone()[0]
+            ids[(codigo, descripcion)] = pid
+        return pid
+
+    def indexar(self, db: Path) -> bool:
+        """Mete (o rehace) un .db de Tienda_<x>/<fecha>/db/. False si no había cambiado."""
+        db = Path(db)
+        st = db.stat()
+        ruta = self._ruta(db)
+        previo = self.conn.execute("SELECT id, mtime_ns, bytes FROM Archivo WHERE ruta = ?", (ruta,)).fetchone()
+        if previo is not None and previo[1:] == (st.st_mtime_ns, st.st_size):
+            return False
+
+        fecha, tienda = db.parent.parent.name, db.parent.parent.parent.name[len("Tienda_"):]
+        formato = _formato(db)
+        src = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            lineas = src.execute(
+                "SELECT Etiqueta, Codigo, Descripcion, SUM(Cantidad) FROM Linea "
+                "GROUP BY Etiqueta, Codigo, Descripcion ORDER BY MIN(id)"
+            ).fetchall()
+        finally:
+            src.close()
+
+        if db.name == "dia.db":
+            # las etiquetas con su propio packinglist_*.db ya entran por ese archivo
+            propias = {p.name for p in db.parent.glob("packinglist_*.db")}
+            lineas = [r for r in lineas if f"packinglist_{tienda}_{fecha}_etq_{r[0]}.db" not in propias]
+
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        try:
+            if previo is None:
+                cur.execute("INSERT INTO Archivo (ruta, mtime_ns, bytes) VALUES (?, ?, ?)",
+                            (ruta, st.st_mtime_ns, st.st_size))
+                archivo = cur.lastrowid
+            else:
+                archivo = previo[0]
+                cur.execute("UPDATE Archivo SET mtime_ns = ?, bytes = ? WHERE id = ?",
+                            (st.st_mtime_ns, st.st_size, archivo))
+                _borrar_origenes(cur, "archivo = ?", [(archivo,)])
+            etiquetas = list(dict.fromkeys(r[0] for r in lineas))
+            if db.name.startswith("packinglist_"):
+                # la misma etiqueta pudo entrar antes por el dia.db
+                _borrar_origenes(cur, "Tienda = ? AND Fecha = ? AND Etiqueta = ? AND Formato = 'RF626A'",
+                                 [(tienda, fecha, etq) for etq in etiquetas])
+            origenes = {}
+            for etq in etiquetas:
+                cur.execute("INSERT INTO Origen (archivo, Tienda, Fecha, Formato, Etiqueta) VALUES (?, ?, ?, ?, ?)",
+                            (archivo, tienda, fecha, formato, etq))
+                origenes[etq] = cur.lastrowid
+            ids = {}
+            cur.executemany(
+                "INSERT INTO Aparicion (producto, origen, Cantidad) VALUES (?, ?, ?)",
+                [(self._producto(cur, codigo, descripcion, ids), origenes[etq], cantidad)
+                 for etq, codigo, descripcion, cantidad in lineas],
+            )
+            cur.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        return True
+
+    def quitar(self, ruta: str):
+        cur = self.conn.cursor()
+        cur.execute("BEGIN")
+        _borrar_origenes(cur, "archivo IN (SELECT id FROM Archivo WHERE ruta = ?)", [(ruta,)])
+        cur.execute("DELETE FROM Archivo WHERE ruta = ?", (ruta,))
+        cur.execute("COMMIT")
+
+    def actualizar(self, dbs) -> int:
+        """Las DBs que acaba de escribir un PDF o un lote (cli.normalizar(...)['dbs']). -> cuántas cambiaron."""
+        return sum(self.indexar(db) for db in dbs if Path(db).name != "conciliacion.db" and Path(db).exists())
+
+    def sincronizar(self) -> dict:
+        """Todo el árbol: indexa lo nuevo/cambiado y quita lo que ya no está en disco."""
+        en_disco = set()
+        cambiados = 0
+        for patron in PATRONES:
+            for db in sorted(self.out_root.glob(f"Tienda_*/*/db/{patron}")):
+                en_disco.add(self._ruta(db))
+                cambiados += self.indexar(db)
+        quitados = [r for (r,) in self.conn.execute("SELECT ruta FROM Archivo") if r not in en_disco]
+        for ruta in quitados:
+            self.quitar(ruta)
+        return {"archivos": len(en_disco), "cambiados": cambiados, "quitados": len(quitados)}
+
+    # ---------- consultas ----------
+    def buscar(self, texto: str, tienda=None, desde=None, hasta=None, limite: int = 200):
+        """
+        texto: un código (exacto) o palabras de la descripción (FTS5; "gel*" = prefijo).
+        -> dicts con Codigo, Descripcion, Tienda, Fecha, Formato, Etiqueta, Cantidad,
+        los más recientes primero.
+        """
+        consulta = consulta_fts(texto) if self.fts else None
+        if texto.isdigit():
+            productos, args = "SELECT id FROM Producto WHERE Codigo = ?", [texto]
+        elif consulta is not None:
+            productos, args = "SELECT rowid FROM ProductoFTS WHERE ProductoFTS MATCH ?", [consulta]
+        else:
+            productos, args = "SELECT id FROM Producto WHERE Descripcion LIKE ?", [f"%{texto}%"]
+        sql = f"""
+            SELECT p.Codigo, p.Descripcion, o.Tienda, o.Fecha, o.Formato, o.Etiqueta, a.Cantidad
+            FROM Aparicion a JOIN Producto p ON p.id = a.producto JOIN Origen o ON o.id = a.origen
+            WHERE a.producto IN ({productos})
+        """
+        if tienda is not None:
+            sql += " AND o.Tienda = ?"
+            args.append(tienda)
+        if desde is not None:
+            sql += " AND o.Fecha >= ?"
+            args.append(desde)
+        if hasta is not None:
+            sql += " AND o.Fecha <= ?"
+            args.append(hasta)
+        sql += " ORDER BY o.Fecha DESC, o.Tienda, o.Etiqueta LIMIT ?"
+        args.append(limite)
+        cols = ("Codigo", "Descripcion", "Tienda", "Fecha", "Formato", "Etiqueta", "Cantidad")
+        return [dict(zip(cols, r)) for r in self.conn.execute(sql, args)]
+
+def abrir(out_root: Path) -> Catalogo:
+    """Catálogo con cerrojo de creación: dos procesos no crean el esquema a la vez."""
+    with bloqueo(Path(out_root) / CATALOGO_DB):
+        return Catalogo(out_root)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catálogo de productos de todo el árbol de salida")
+    sub = parser.add_subparsers(dest="orden", required=True)
+    p = sub.add_parser("sincronizar", help="indexa las DBs nuevas/cambiadas y quita las borradas")
+    p.add_argument("-o", "--out", type=Path, required=True, help="carpeta raíz de salida")
+    p = sub.add_parser("buscar", help="dónde salió un código o una descripción")
+    p.add_argument("texto", help="código exacto o palabras de la descripción (FTS5)")
+    p.add_argument("-o", "--out", type=Path, required=True, help="carpeta raíz de salida")
+    p.add_argument("--tienda")
+    p.add_argument("--dias", type=int, help="solo los últimos N días")
+    p.add_argument("--limite", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if not args.out.is_dir():
+        print(f"error: {args.out} no es una carpeta", file=sys.stderr)
+        return cli.EXIT_USO
+    cat = abrir(args.out)
+    try:
+        if args.orden == "sincronizar":
+            print(json.dumps(cat.sincronizar()))
+            return cli.EXIT_OK
+        desde = (date.today() - timedelta(days=args.dias)).isoformat() if args.dias else None
+        for r in cat.buscar(args.texto, args.tienda, desde, limite=args.limite):
+            print(json.dumps(r, ensure_ascii=False))
+    finally:
+        cat.close()
+    return cli.EXIT_OK
+
+if __name__ == "__main__":
+    raise SystemExit(main())
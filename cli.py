@@ -0,0 +1,263 @@
+import argparse
+import glob
+import json
+import sys
+from functools import partial
+from pathlib import Path
+
+from lote import Diferido, Fusion, procesar_lote, registro_arg, resolve_workers, workers_arg
+from metricas import Metricas, emitir
+from registro import Registro
+
+FORMATOS = ("RF626A", "RF625A", "auto")
+
+# códigos de salida
+EXIT_OK = 0
+EXIT_FALLOS = 1    # algún PDF falló o se rechazó
+EXIT_USO = 2       # argumentos mal / no hay PDFs
+
+# ---------- entradas ----------
+def expandir_entradas(entradas):
+    """Archivos, carpetas (sus *.pdf) o globs -> lista de PDFs sin repetidos, en orden."""
+    out = {}
+    for e in entradas:
+        p = Path(e)
+        if p.is_dir():
+            hits = sorted(x for x in p.iterdir() if x.suffix.lower() == ".pdf")
+        elif p.is_file():
+            hits = [p]
+        else:
+            hits = [Path(x) for x in sorted(glob.glob(e, recursive=True)) if x.lower().endswith(".pdf")]
+        for h in hits:
+            out.setdefault(h.resolve(), h)
+    return list(out.values())
+
+# ---------- parsers por formato ----------
+def _parsers(formato, propio, page_workers, salida, memoria_acotada=False, diferir=False, incremental=False):
+    """
+    formato -> (process_pdf, versión del parser).
+    propio: {formato: (process_pdf, versión)} del script que llama; los demás
+    formatos (modo auto) usan convertir_pdf / cajas_azules.
+    """
+    procs = {}
+    for f in (("RF626A", "RF625A") if formato == "auto" else (formato,)):
+        if f in propio:
+            proc, version = propio[f]
+        elif f == "RF626A":
+            import convertir_pdf as mod
+            proc, version = mod.process_pdf, mod.PARSER_VERSION
+        else:
+            import cajas_azules as mod
+            proc, version = mod.process_pdf, mod.PARSER_VERSION
+        if f == "RF626A":
+            proc = partial(proc, page_workers=page_workers, salida=salida, memoria_acotada=memoria_acotada,
+                           diferir=diferir, incremental=incremental)
+            version = f"{version}/{salida}"
+        else:
+            proc = partial(proc, incremental=incremental)
+        procs[f] = (proc, version)
+    return procs
+
+def _auto(pdf_path, out_root, opciones, **kwargs):
+    from despachador import despachar
+    return despachar(pdf_path, out_root, opciones, **kwargs)
+
+def preparar(formato, propio, page_workers, salida, metricas=None, diagnostico=False,
+             memoria_acotada=False, diferir=False, incremental=False):
+    """
+    -> (process_pdf listo para procesar_lote, versión para el registro)
+    metricas: destino de las métricas por PDF ("-" = stdout, o un .jsonl); None = sin métricas
+    diagnostico: motivos de rechazo del parser en la línea de métricas (sin destino -> stdout)
+    memoria_acotada: (RF626A) cada etiqueta se escribe y se suelta al terminar sus páginas
+    diferir: (RF626A) los PDFs no escriben sus DBs, devuelven lote.Diferido para una
+    lote.Fusion (pasarla a procesar_lote, con el mismo destino de métricas)
+    incremental: las DBs que ya existen se actualizan con el delta y conservan Falta
+    (con diferir lo hace la Fusion: Fusion(incremental=True))
+    """
+    if diagnostico and metricas is None:
+        metricas = "-"
+    # en auto manda el despachador (sus parsers registrados), no el del script
+    procs = _parsers(formato, {} if formato == "auto" else propio, page_workers, salida, memoria_acotada, diferir,
+                     incremental)
+    if formato == "auto":
+        # despachador: un solo fitz.open por PDF, mezcla RF625A/RF626A en la misma pasada
+        proc = partial(_auto, opciones={"RF626A": {
+            "page_workers": page_workers, "salida": salida, "memoria_acotada": memoria_acotada,
+            "diferir": diferir, "incremental": incremental,
+        }, "RF625A": {"incremental": incremental}})
+    else:
+        proc = procs[formato][0]
+    version = "+".join(v for _, v in procs.values())
+    return partial(_proteger, proc, metricas=metricas, diagnostico=diagnostico), version
+
+def _proteger(proc, pdf_path, out_root, metricas=None, diagnostico=False):
+    # un PDF roto no tumba el lote: se devuelve como rechazo
+    # con métricas, el proceso que hizo el PDF (worker incluido) emite su línea
+    if metricas is None:
+        try:
+            return proc(pdf_path, out_root)
+        except Exception as e:
+            return {"ok": False, "reason": f"{type(e).__name__}: {e}", "pdf": Path(pdf_path).name}
+
+    m = Metricas(Path(pdf_path).name, diagnostico)
+    m.contar("pdf_bytes", Path(pdf_path).stat().st_size)
+    try:
+        res = proc(pdf_path, out_root, metricas=m)
+    except Exception as e:
+        res = {"ok": False, "reason": f"{type(e).__name__}: {e}", "pdf": Path(pdf_path).name}
+    emitir(m.a_dict(ok=isinstance(res, (tuple, Diferido)) or bool(res.get("ok"))), metricas)
+    return res
+
+# ---------- resultados ----------
+def normalizar(pdf_path: Path, res, saltado: bool) -> dict:
+    """Resultado de cualquier process_pdf -> dict plano (una línea JSON)."""
+    if isinstance(res, tuple):
+        tienda, fecha, dest_pdf, out_dbs = res
+        return {
+            "ok": True, "formato": "RF626A", "pdf": pdf_path.name, "saltado": saltado,
+            "tienda": tienda, "fecha": fecha,
+            "pdf_saved": str(dest_pdf), "dbs": [str(p) for p in out_dbs],
+        }
+    out = {"pdf": pdf_path.name, **res, "saltado": saltado}
+    if res.get("ok"):
+        out["formato"] = "RF625A"
+        out["dbs"] = [res["db_saved"]]
+    return out
+
+def imprimir(r: dict):
+    # salida "humana" de siempre (modo --gui)
+    if not r["ok"]:
+        print(f"⚠️  {r['pdf']} -> {r['reason']}")
+        return
+    if r["saltado"]:
+        print(f"⏭️  {Path(r['pdf_saved']).name} ya procesado (Tienda_{r['tienda']}/{r['fecha']}), usa --force para repetir")
+        return
+    print(f"✅ {Path(r['pdf_saved']).name}  ->  Tienda_{r['tienda']}/{r['fecha']}")
+    productos = f"  ({r['productos']} productos)" if "productos" in r else ""
+    for db in r["dbs"]:
+        print(f"   🗃️ {Path(db).name}{productos}")
+    print()
+
+# ---------- main ----------
+def metricas_arg(parser):
+    parser.add_argument(
+        "--metricas", metavar="DESTINO",
+        help="tiempos por etapa y contadores por PDF, una línea JSON cada uno ('-' = stdout, o un .jsonl)",
+    )
+    parser.add_argument(
+        "--diagnostico", action="store_true",
+        help="añade a las métricas las líneas rechazadas por motivo/página y una muestra de cada motivo",
+    )
+
+def memoria_arg(parser):
+    parser.add_argument(
+        "--memoria-acotada", action="store_true",
+        help="(RF626A) escribe y suelta cada etiqueta al terminar sus páginas, para PDFs enormes "
+             "(ignora --page-workers; el pico de memoria sale en --metricas)",
+    )
+
+def fusion_arg(parser):
+    parser.add_argument(
+        "--por-pdf", action="store_true",
+        help="(RF626A) escribe las DBs de cada PDF al terminarlo, sin juntar las etiquetas "
+             "que se repiten entre PDFs del lote (la segunda pisa a la primera)",
+    )
+
+def incremental_arg(parser):
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="actualiza las DBs que ya existen solo con lo que cambia: conserva Falta y no toca "
+             "un .db sin cambios (ignorado con --memoria-acotada)",
+    )
+
+def exportar_arg(parser):
+    parser.add_argument(
+        "--exportar", action="store_true",
+        help="al acabar el lote, rehace el export columnar de cada tienda/día tocado "
+             "(<out>/export/tienda=<x>/fecha=<y>/, Parquet con pyarrow o CSV)",
+    )
+
+def build_parser(descripcion, formato, salida_por_defecto):
+    parser = argparse.ArgumentParser(description=descripcion)
+    parser.add_argument("entradas", nargs="*", help="PDFs, carpetas o globs (\"inbox/*.pdf\")")
+    parser.add_argument("-o", "--out", type=Path, help="carpeta raíz de salida (Tienda_<x>/<fecha>/...)")
+    parser.add_argument("--formato", choices=FORMATOS, default=formato)
+    parser.add_argument(
+        "--salida", choices=("etiqueta", "dia", "ambos"), default=salida_por_defecto,
+        help="(RF626A) un .db por etiqueta, un dia.db por tienda/día, o los dos",
+    )
+    parser.add_argument("--gui", action="store_true", help="elegir PDFs y destino con ventanas (tkinter)")
+    metricas_arg(parser)
+    memoria_arg(parser)
+    fusion_arg(parser)
+    incremental_arg(parser)
+    exportar_arg(parser)
+    workers_arg(parser)
+    registro_arg(parser)
+    return parser
+
+def main(argv=None, *, descripcion, formato, process_pdf, parser_version, pick, salida_por_defecto="etiqueta"):
+    """
+    Entrada común de batch_convert.py / convertir_pdf.py / cajas_azules.py.
+    Sin --gui no se importa tkinter: apto para servidor/cron. Cada PDF produce una
+    línea JSON en stdout. Devuelve el código de salida.
+    """
+    parser = build_parser(descripcion, formato, salida_por_defecto)
+    args = parser.parse_args(argv)
+
+    if args.gui:
+        pdfs, out_root = pick()
+        if not pdfs or out_root is None:
+            print("Cancelado.")
+            return EXIT_OK
+        pdfs = [Path(p) for p in pdfs]
+        print(f"\n📁 DESTINO: {out_root}\n")
+    else:
+        if not args.entradas or args.out is None:
+            parser.print_usage(sys.stderr)
+            print("error: hacen falta PDFs y -o/--out (o --gui)", file=sys.stderr)
+            return EXIT_USO
+        pdfs, out_root = expandir_entradas(args.entradas), args.out
+        if not pdfs:
+            print("error: no se encontraron PDFs", file=sys.stderr)
+            return EXIT_USO
+
+    # etiquetas repetidas entre PDFs: se suman y cada DB se escribe una vez (lote.Fusion)
+    diferir = len(pdfs) > 1 and not args.por_pdf and not args.memoria_acotada
+    proc, version = preparar(
+        args.formato, {formato: (process_pdf, parser_version)},
+        resolve_workers(args.page_workers), args.salida, args.metricas, args.diagnostico,
+        args.memoria_acotada, diferir, args.incremental,
+    )
+
+    from catalogo import abrir as abrir_catalogo  # catalogo usa los EXIT_* de aquí
+
+    registro = Registro(out_root, version)
+    catalogo = abrir_catalogo(out_root)
+    exit_code = EXIT_OK
+    escritas = []  # DBs de este lote (para --exportar)
+    try:
+        for pdf, res, saltado in procesar_lote(
+            proc, pdfs, out_root, resolve_workers(args.workers), registro, args.force,
+            fusion=Fusion(args.incremental, args.metricas) if diferir else None,
+        ):
+            r = normalizar(pdf, res, saltado)
+            if not r["ok"]:
+                exit_code = EXIT_FALLOS
+            elif not saltado:
+                catalogo.actualizar(r["dbs"])
+                escritas += r["dbs"]
+            if args.gui:
+                imprimir(r)
+            else:
+                print(json.dumps(r, ensure_ascii=False), flush=True)
+    finally:
+        registro.close()
+        catalogo.close()
+
+    if args.exportar:
+        from exportar import exportar_lote
+        exportar_lote(out_root, escritas)
+    if args.gui:
+        print("Listo.")
+    return exit_code
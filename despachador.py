@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import cajas_azules
+import convertir_pdf
+from cabecera import words_text
+from metricas import SIN_METRICAS
+
+# ---------- registro de parsers ----------
+# formato -> process_doc(doc, pdf_path, out_root, first_words=..., **opciones)
+# (cada process_doc usa su parse_side_*: RF625A -> parse_side_rf625a,
+#  RF626A -> parse_side_rf626a)
+PARSERS = {}
+
+def registrar(formato: str, process_doc):
+    PARSERS[formato] = process_doc
+
+registrar("RF625A", cajas_azules.process_doc)
+registrar("RF626A", convertir_pdf.process_doc)
+
+# ---------- clasificación por cabecera ----------
+def clasificar(first_text: str):
+    """Formato a partir del texto de la primera página, o None si no se reconoce."""
+    if cajas_azules.is_rf625a(first_text):
+        return "RF625A"
+    if "RF626A" in first_text or "LISTADO CONTENIDO POR FORMATO" in first_text.upper():
+        return "RF626A"
+    return None
+
+def despachar(pdf_path: Path, out_root: Path, opciones=None, metricas=SIN_METRICAS):
+    """
+    Abre el PDF UNA vez, clasifica por la cabecera de la página 0 y le pasa el doc
+    abierto y las words ya extraídas al parser registrado (no se reabre ni se
+    vuelve a extraer la página 0).
+    opciones: {formato: kwargs extra para su process_doc}
+    """
+    pdf_path = Path(pdf_path)
+    with metricas.etapa("abrir"):
+        doc = fitz.open(str(pdf_path))
+    with metricas.etapa("texto"):
+        first_words = doc[0].get_text("words")
+    formato = clasificar(words_text(first_words))
+    if formato not in PARSERS:
+        doc.close()
+        return {"ok": False, "reason": "Formato no reconocido (ni RF625A ni RF626A)", "pdf": pdf_path.name}
+
+    kwargs = (opciones or {}).get(formato, {})
+    try:
+        return PARSERS[formato](doc, pdf_path, out_root, first_words=first_words, metricas=metricas, **kwargs)
+    finally:
+        # el process_doc lo cierra antes de mover el PDF; si falló antes, aquí
+        # (no cuando lo recoja el GC)
+        if not doc.is_closed:
+            doc.close()
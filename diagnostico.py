@@ -0,0 +1,98 @@
+import random
+from collections import defaultdict
+
+from gramatica import MOTIVOS, SIN_CANTIDAD, SIN_DESCRIPCION, VACIA
+
+# Por qué se pierden líneas: cada rechazo de Gramatica.parse(..., diag) se cuenta por
+# formato, motivo y página, y se guarda una muestra acotada (reservoir) de los tokens
+# crudos por motivo. Con miles de páginas la memoria no crece: contadores + K muestras.
+MUESTRAS = 20  # tokens crudos guardados por (formato, motivo)
+
+class Diagnostico:
+    def __init__(self, muestras: int = MUESTRAS, seed: int = 0):
+        self.k = muestras
+        self.rnd = random.Random(seed)
+        self.pagina = None  # la fija extract_items_* antes de parsear cada página
+        self.aceptadas = defaultdict(int)                       # formato -> n
+        self.rechazos = defaultdict(lambda: defaultdict(int))   # formato -> motivo -> n
+        self.por_pagina = defaultdict(lambda: defaultdict(int)) # página -> motivo -> n (sin VACIA)
+        self.muestras = defaultdict(list)                       # (formato, motivo) -> [(página, tokens)]
+
+    def aceptada(self, formato: str):
+        self.aceptadas[formato] += 1
+
+    def rechazo(self, formato: str, motivo: str, tokens):
+        por_motivo = self.rechazos[formato]
+        por_motivo[motivo] += 1
+        if motivo == VACIA:
+            return  # mitades en blanco: solo se cuentan
+        self.por_pagina[self.pagina][motivo] += 1
+
+        # reservoir (algoritmo R): cada rechazo tiene la misma probabilidad de quedar
+        n, caja = por_motivo[motivo], self.muestras[(formato, motivo)]
+        if len(caja) < self.k:
+            caja.append((self.pagina, list(tokens)))
+        else:
+            j = self.rnd.randrange(n)
+            if j < self.k:
+                caja[j] = (self.pagina, list(tokens))
+
+    def estado(self) -> dict:
+        """Contadores y muestras en dicts normales (pickle): lo que devuelve un worker de --page-workers."""
+        return {
+            "aceptadas": dict(self.aceptadas),
+            "rechazos": {f: dict(c) for f, c in self.rechazos.items()},
+            "por_pagina": {p: dict(c) for p, c in self.por_pagina.items()},
+            "muestras": dict(self.muestras),
+        }
+
+    def mezclar(self, estado: dict):
+        """
+        Suma el estado() de otro Diagnostico (un rango de páginas). Las muestras se
+        juntan como un solo reservoir: cada hueco sale de un lado con probabilidad
+        proporcional a los rechazos que vio ese lado.
+        """
+        for f, n in estado["aceptadas"].items():
+            self.aceptadas[f] += n
+        vistos = {}
+        for f, por_motivo in estado["rechazos"].items():
+            for m, n in por_motivo.items():
+                vistos[(f, m)] = (self.rechazos[f][m], n)
+                self.rechazos[f][m] += n
+        for p, por_motivo in estado["por_pagina"].items():
+            for m, n in por_motivo.items():
+                self.por_pagina[p][m] += n
+        for clave, otra in estado["muestras"].items():
+            mias = self.muestras[clave]
+            n_mias, n_otra = vistos[clave]
+            mias, otra = list(mias), list(otra)
+            juntas = []
+            while len(juntas) < self.k and (mias or otra):
+                if otra and (not mias or self.rnd.randrange(n_mias + n_otra) >= n_mias):
+                    juntas.append(otra.pop(self.rnd.randrange(len(otra))))
+                    n_otra -= 1
+                else:
+                    juntas.append(mias.pop(self.rnd.randrange(len(mias))))
+                    n_mias -= 1
+            self.muestras[clave] = juntas
+
+    def a_dict(self) -> dict:
+        formatos = {}
+        for f in sorted(set(self.aceptadas) | set(self.rechazos)):
+            rech = self.rechazos.get(f, {})
+            ok = self.aceptadas.get(f, 0)
+            # candidatas = con código (las cabeceras y los totales caen en sin_codigo)
+            candidatas = ok + rech.get(SIN_CANTIDAD, 0) + rech.get(SIN_DESCRIPCION, 0)
+            formatos[f] = {
+                "aceptadas": ok,
+                "rechazos": {m: rech[m] for m in MOTIVOS if rech.get(m)},
+                "rendimiento": round(ok / candidatas, 4) if candidatas else None,
+                "muestras": {
+                    m: [{"pagina": p, "tokens": t} for p, t in self.muestras[(f, m)]]
+                    for m in MOTIVOS if (f, m) in self.muestras
+                },
+            }
+        return {
+            "formatos": formatos,
+            "por_pagina": {str(p): dict(c) for p, c in self.por_pagina.items()},
+        }
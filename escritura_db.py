@@ -0,0 +1,372 @@
+import sqlite3
+from pathlib import Path
+
+# PRAGMAs para archivos de salida NUEVOS: se generan de cero desde el PDF, así que si
+# algo falla a mitad se vuelven a generar. No hace falta journal en disco ni fsync por
+# transacción. Solo para un archivo que aún no existe (ver pragmas_de).
+PRAGMAS_ESCRITURA = (
+    "PRAGMA journal_mode = MEMORY",  # sin archivo -journal (y no deja WAL para la app)
+    "PRAGMA synchronous = OFF",
+    "PRAGMA page_size = 4096",       # solo aplica a archivos nuevos
+    "PRAGMA temp_store = MEMORY",
+)
+# Escritura incremental: el .db ya tiene lo que apuntó la tienda (Falta), así que aquí
+# sí hace falta journal en disco y fsync (un corte a mitad no puede dejarlo roto).
+PRAGMAS_INCREMENTAL = (
+    "PRAGMA journal_mode = DELETE",
+    "PRAGMA synchronous = FULL",
+    "PRAGMA temp_store = MEMORY",
+)
+# Un .db que ya existe y se reescribe en su sitio (reprocesar un PDF, la Fusion del
+# lote, conciliacion.db): sin journal en disco, un corte a mitad dejaría roto el que
+# había (y la app puede tenerlo abierto). Journal en disco; fsync en el commit
+# (NORMAL: un corte puede perder la última transacción, no romper el archivo).
+PRAGMAS_EXISTENTE = (
+    "PRAGMA journal_mode = DELETE",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+)
+# dia.db que ya existe: además tiene las etiquetas de otros PDFs del día y lo que
+# apuntó la tienda, y no se regenera desde un solo PDF.
+PRAGMAS_DIA = PRAGMAS_EXISTENTE
+
+# Esquema de los .db que se crean nuevos: 1 = el de siempre (tablas de texto sueltas),
+# 2 = normalizado (ver ensure_schema_v2). Un .db que ya existe se escribe en el suyo
+# (PRAGMA user_version), así que los migrados con esquema.py se quedan en 2.
+ESQUEMA_NUEVAS = 1
+
+# ---------- schema (el que lee la app) ----------
+def ensure_schema(cur):
+    cur.execute("CREATE TABLE IF NOT EXISTS Etiqueta (Etiqueta TEXT PRIMARY KEY)")
+    cur.execute("CREATE TABLE IF NOT EXISTS Codigo (Codigo TEXT PRIMARY KEY)")
+    cur.execute("CREATE TABLE IF NOT EXISTS Descripcion (Descripcion TEXT PRIMARY KEY)")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS Linea (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Etiqueta TEXT NOT NULL,
+            Codigo TEXT NOT NULL,
+            Descripcion TEXT NOT NULL,
+            Cantidad INTEGER NOT NULL,
+            Falta INTEGER DEFAULT 0
+        )
+    """)
+
+# ---------- schema v2 (normalizado) ----------
+# Tablas con claves enteras: Lineas guarda ids de Etiquetas/Codigos/Descripciones en vez
+# de repetir los textos en cada fila, con índices que cubren las consultas de la app
+# (por etiqueta y por código) sin tocar la tabla. Las vistas Etiqueta/Codigo/
+# Descripcion/Linea tienen las columnas de siempre y triggers INSTEAD OF, así que la
+# app (y los write_db de aquí) leen y escriben igual que en el esquema 1.
+ESQUEMA_V2 = """
+    CREATE TABLE IF NOT EXISTS Etiquetas (id INTEGER PRIMARY KEY, Etiqueta TEXT NOT NULL UNIQUE);
+    CREATE TABLE IF NOT EXISTS Codigos (id INTEGER PRIMARY KEY, Codigo TEXT NOT NULL UNIQUE);
+    CREATE TABLE IF NOT EXISTS Descripciones (id INTEGER PRIMARY KEY, Descripcion TEXT NOT NULL UNIQUE);
+    CREATE TABLE IF NOT EXISTS Lineas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        etiqueta INTEGER NOT NULL REFERENCES Etiquetas (id),
+        codigo INTEGER NOT NULL REFERENCES Codigos (id),
+        descripcion INTEGER NOT NULL REFERENCES Descripciones (id),
+        Cantidad INTEGER NOT NULL,
+        Falta INTEGER DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_Lineas_etiqueta ON Lineas (etiqueta, codigo, descripcion, Cantidad, Falta);
+    CREATE INDEX IF NOT EXISTS idx_Lineas_codigo ON Lineas (codigo, etiqueta, descripcion, Cantidad, Falta);
+
+    CREATE VIEW IF NOT EXISTS Etiqueta AS SELECT Etiqueta FROM Etiquetas;
+    CREATE VIEW IF NOT EXISTS Codigo AS SELECT Codigo FROM Codigos;
+    CREATE VIEW IF NOT EXISTS Descripcion AS SELECT Descripcion FROM Descripciones;
+    CREATE VIEW IF NOT EXISTS Linea AS
+        SELECT l.id AS id, e.Etiqueta AS Etiqueta, c.Codigo AS Codigo, d.Descripcion AS Descripcion,
+               l.Cantidad AS Cantidad, l.Falta AS Falta
+        FROM Lineas l
+        JOIN Etiquetas e ON e.id = l.etiqueta
+        JOIN Codigos c ON c.id = l.codigo
+        JOIN Descripciones d ON d.id = l.descripcion;
+
+    CREATE TRIGGER IF NOT EXISTS Etiqueta_insert INSTEAD OF INSERT ON Etiqueta BEGIN
+        INSERT OR IGNORE INTO Etiquetas (Etiqueta) VALUES (NEW.Etiqueta);
+    END;
+    CREATE TRIGGER IF NOT EXISTS Etiqueta_delete INSTEAD OF DELETE ON Etiqueta BEGIN
+        DELETE FROM Etiquetas WHERE Etiqueta = OLD.Etiqueta;
+    END;
+    CREATE TRIGGER IF NOT EXISTS Codigo_insert INSTEAD OF INSERT ON Codigo BEGIN
+        INSERT OR IGNORE INTO Codigos (Codigo) VALUES (NEW.Codigo);
+    END;
+    CREATE TRIGGER IF NOT EXISTS Codigo_delete INSTEAD OF DELETE ON Codigo BEGIN
+        DELETE FROM Codigos WHERE Codigo = OLD.Codigo;
+    END;
+    CREATE TRIGGER IF NOT EXISTS Descripcion_insert INSTEAD OF INSERT ON Descripcion BEGIN
+        INSERT OR IGNORE INTO Descripciones (Descripcion) VALUES (NEW.Descripcion);
+    END;
+    CREATE TRIGGER IF NOT EXISTS Descripcion_delete INSTEAD OF DELETE ON Descripcion BEGIN
+        DELETE FROM Descripciones WHERE Descripcion = OLD.Descripcion;
+    END;
+    CREATE TRIGGER IF NOT EXISTS Linea_insert INSTEAD OF INSERT ON Linea BEGIN
+        INSERT OR IGNORE INTO Etiquetas (Etiqueta) VALUES (NEW.Etiqueta);
+        INSERT OR IGNORE INTO Codigos (Codigo) VALUES (NEW.Codigo);
+        INSERT OR IGNORE INTO Descripciones (Descripcion) VALUES (NEW.Descripcion);
+        INSERT INTO Lineas (id, etiqueta, codigo, descripcion, Cantidad, Falta) VALUES (
+            NEW.id,
+            (SELECT id FROM Etiquetas WHERE Etiqueta = NEW.Etiqueta),
+            (SELECT id FROM Codigos WHERE Codigo = NEW.Codigo),
+            (SELECT id FROM Descripciones WHERE Descripcion = NEW.Descripcion),
+            NEW.Cantidad, COALESCE(NEW.Falta, 0)
+        );
+    END;
+    CREATE TRIGGER IF NOT EXISTS Linea_update INSTEAD OF UPDATE ON Linea BEGIN
+        INSERT OR IGNORE INTO Etiquetas (Etiqueta) VALUES (NEW.Etiqueta);
+        INSERT OR IGNORE INTO Codigos (Codigo) VALUES (NEW.Codigo);
+        INSERT OR IGNORE INTO Descripciones (Descripcion) VALUES (NEW.Descripcion);
+        UPDATE Lineas SET
+            id = NEW.id,
+            etiqueta = (SELECT id FROM Etiquetas WHERE Etiqueta = NEW.Etiqueta),
+            codigo = (SELECT id FROM Codigos WHERE Codigo = NEW.Codigo),
+            descripcion = (SELECT id FROM Descripciones WHERE Descripcion = NEW.Descripcion),
+            Cantidad = NEW.Cantidad,
+            Falta = NEW.Falta
+        WHERE id = OLD.id;
+    END;
+    CREATE TRIGGER IF NOT EXISTS Linea_delete INSTEAD OF DELETE ON Linea BEGIN
+        DELETE FROM Lineas WHERE id = OLD.id;
+    END;
+"""
+
+def ensure_schema_v2(cur):
+    # executescript haría COMMIT de la transacción abierta: sentencia a sentencia
+    for sentencia in _sentencias(ESQUEMA_V2):
+        cur.execute(sentencia)
+    cur.execute("PRAGMA user_version = 2")
+
+def _sentencias(script: str):
+    actual = ""
+    for linea in script.splitlines(keepends=True):
+        actual += linea
+        if sqlite3.complete_statement(actual):
+            yield actual.strip()
+            actual = ""
+
+def preparar_esquema(cur, esquema=None, dia: bool = False) -> int:
+    """
+    Crea lo que falte del esquema del archivo y devuelve su versión: la que ya tiene
+    (PRAGMA user_version; 0 = esquema 1) o, si está vacío, `esquema` / ESQUEMA_NUEVAS.
+    dia: índice por etiqueta de dia.db (en el esquema 2 ya lo cubre idx_Lineas_etiqueta).
+    """
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0 and cur.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is None:
+        version = esquema or ESQUEMA_NUEVAS
+    if version >= 2:
+        ensure_schema_v2(cur)
+        return 2
+    if dia:
+        ensure_schema_dia(cur)
+    else:
+        ensure_schema(cur)
+    return 1
+
+def esquema_de(path: Path) -> int:
+    """Versión del esquema de un .db que ya existe (1 si no tiene user_version)."""
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0] or 1
+    finally:
+        conn.close()
+
+def pragmas_de(out_path):
+    """PRAGMAS_ESCRITURA solo si el archivo aún no existe; si no, PRAGMAS_EXISTENTE."""
+    return PRAGMAS_EXISTENTE if Path(out_path).exists() else PRAGMAS_ESCRITURA
+
+def connect_escritura(out_path, pragmas=PRAGMAS_ESCRITURA):
+    # isolation_level=None: las transacciones las abrimos nosotros (BEGIN/COMMIT)
+    conn = sqlite3.connect(str(out_path), isolation_level=None)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    conn.execute("PRAGMA foreign_keys = ON")  # esquema 2; en el 1 no hay claves ajenas
+    return conn
+
+# ---------- escritura en bloque ----------
+def write_db(etiqueta, acc, out_path: Path, esquema=None):
+    """
+    acc: (codigo, descripcion) -> cantidad
+    Reescribe el archivo entero en UNA transacción, con executemany por tabla
+    (antes eran 3 execute por producto).
+    esquema: versión si el archivo es nuevo (por defecto ESQUEMA_NUEVAS).
+    Un archivo que ya existe se reescribe con journal en disco (pragmas_de).
+    """
+    rows = [(etiqueta, codigo, descripcion, cantidad) for (codigo, descripcion), cantidad in acc.items()]
+
+    conn = connect_escritura(out_path, pragmas_de(out_path))
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        preparar_esquema(cur, esquema)
+
+        cur.execute("DELETE FROM Linea")
+        cur.execute("DELETE FROM Etiqueta")
+        cur.execute("DELETE FROM Codigo")
+        cur.execute("DELETE FROM Descripcion")
+
+        cur.execute("INSERT INTO Etiqueta (Etiqueta) VALUES (?)", (etiqueta,))
+        # dict.fromkeys: sin repetidos y en el mismo orden que antes
+        cur.executemany("INSERT OR IGNORE INTO Codigo (Codigo) VALUES (?)", [(c,) for c in dict.fromkeys(r[1] for r in rows)])
+        cur.executemany("INSERT OR IGNORE INTO Descripcion (Descripcion) VALUES (?)", [(d,) for d in dict.fromkeys(r[2] for r in rows)])
+        cur.executemany(
+            "INSERT INTO Linea (Etiqueta, Codigo, Descripcion, Cantidad, Falta) VALUES (?, ?, ?, ?, 0)",
+            rows,
+        )
+        cur.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+# ---------- escritura incremental (conserva Falta) ----------
+def _delta_linea(cur, etiqueta, acc) -> bool:
+    """
+    Deja las líneas de `etiqueta` iguales a acc tocando solo lo que cambia: INSERT de
+    lo nuevo, UPDATE de Cantidad (Falta, la que apuntó la tienda, se queda) y DELETE
+    de lo que ya no viene. True si cambió algo.
+    """
+    existentes, sobran = {}, []
+    for id_, codigo, descripcion, cantidad in cur.execute(
+        "SELECT id, Codigo, Descripcion, Cantidad FROM Linea WHERE Etiqueta = ? ORDER BY id", (etiqueta,)
+    ).fetchall():
+        if (codigo, descripcion) in existentes:
+            sobran.append((id_,))  # repetida: se queda la primera
+        else:
+            existentes[(codigo, descripcion)] = (id_, cantidad)
+
+    nuevas, cambios = [], []
+    for (codigo, descripcion), cantidad in acc.items():
+        previa = existentes.pop((codigo, descripcion), None)
+        if previa is None:
+            nuevas.append((etiqueta, codigo, descripcion, cantidad))
+        elif previa[1] != cantidad:
+            cambios.append((cantidad, previa[0]))
+    sobran += [(id_,) for id_, _ in existentes.values()]
+    if not (nuevas or cambios or sobran):
+        return False
+
+    cur.executemany("DELETE FROM Linea WHERE id = ?", sobran)
+    cur.executemany("UPDATE Linea SET Cantidad = ? WHERE id = ?", cambios)
+    cur.executemany("INSERT OR IGNORE INTO Codigo (Codigo) VALUES (?)", [(c,) for c in dict.fromkeys(r[1] for r in nuevas)])
+    cur.executemany("INSERT OR IGNORE INTO Descripcion (Descripcion) VALUES (?)", [(d,) for d in dict.fromkeys(r[2] for r in nuevas)])
+    cur.executemany(
+        "INSERT INTO Linea (Etiqueta, Codigo, Descripcion, Cantidad, Falta) VALUES (?, ?, ?, ?, 0)",
+        nuevas,
+    )
+    return True
+
+def _podar(cur):
+    # códigos/descripciones que ya no usa ninguna línea (una etiqueta reescrita)
+    cur.execute("DELETE FROM Codigo WHERE Codigo NOT IN (SELECT Codigo FROM Linea)")
+    cur.execute("DELETE FROM Descripcion WHERE Descripcion NOT IN (SELECT Descripcion FROM Linea)")
+
+def write_db_incremental(etiqueta, acc, out_path: Path) -> bool:
+    """
+    Como write_db, pero contra el .db que ya hay: solo los INSERT/UPDATE/DELETE que
+    hacen falta, en una transacción, y Falta no se pierde al reprocesar un PDF.
+    Sin diferencias no se escribe nada (ni cambia la fecha del archivo): devuelve False.
+    """
+    if not Path(out_path).exists():
+        write_db(etiqueta, acc, out_path)
+        return True
+
+    conn = connect_escritura(out_path, PRAGMAS_INCREMENTAL)
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        preparar_esquema(cur)
+        cambio = _delta_linea(cur, etiqueta, acc)
+        # un .db por etiqueta: lo que haya de otra sobra
+        cur.execute("DELETE FROM Linea WHERE Etiqueta <> ?", (etiqueta,))
+        cambio |= cur.rowcount > 0
+        cur.execute("DELETE FROM Etiqueta WHERE Etiqueta <> ?", (etiqueta,))
+        cambio |= cur.rowcount > 0
+        cur.execute("INSERT OR IGNORE INTO Etiqueta (Etiqueta) VALUES (?)", (etiqueta,))
+        cambio |= cur.rowcount > 0
+        if cambio:
+            _podar(cur)
+            cur.execute("COMMIT")
+        else:
+            cur.execute("ROLLBACK")
+        return cambio
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def leer_acc(out_path: Path, etiqueta) -> dict:
+    """(codigo, descripcion) -> cantidad de una etiqueta ya escrita, en el orden en que se escribió."""
+    conn = sqlite3.connect(str(out_path))
+    try:
+        cur = conn.execute(
+            "SELECT Codigo, Descripcion, Cantidad FROM Linea WHERE Etiqueta = ? ORDER BY id", (etiqueta,)
+        )
+        return {(codigo, descripcion): cantidad for codigo, descripcion, cantidad in cur}
+    finally:
+        conn.close()
+
+# ---------- DB consolidada por tienda/día ----------
+DIA_DB = "dia.db"
+
+def ensure_schema_dia(cur):
+    ensure_schema(cur)
+    # la app filtra por etiqueta: sin índice sería un scan de todo el día
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_Linea_Etiqueta ON Linea (Etiqueta)")
+
+def write_dia_db(por_etiqueta, out_path: Path, incremental: bool = False) -> bool:
+    """
+    Tienda_<x>/<fecha>/db/dia.db con TODAS las etiquetas del día (mismas tablas que
+    los packinglist_*.db). Solo se reemplazan las etiquetas de `por_etiqueta`;
+    las que vinieron en otros PDFs del mismo día se quedan como están.
+    incremental: como write_db_incremental, etiqueta a etiqueta (Falta se conserva);
+    devuelve False si no había nada que cambiar.
+    Solo un dia.db nuevo se escribe sin journal (PRAGMAS_ESCRITURA).
+    """
+    pragmas = PRAGMAS_INCREMENTAL if incremental else pragmas_de(out_path)  # existe: PRAGMAS_DIA
+    conn = connect_escritura(out_path, pragmas)
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN")
+        preparar_esquema(cur, dia=True)
+
+        if incremental:
+            cambio = False
+            for etq, acc in por_etiqueta.items():
+                cambio |= _delta_linea(cur, etq, acc)
+                cur.execute("INSERT OR IGNORE INTO Etiqueta (Etiqueta) VALUES (?)", (etq,))
+                cambio |= cur.rowcount > 0
+            if cambio:
+                _podar(cur)
+                cur.execute("COMMIT")
+            else:
+                cur.execute("ROLLBACK")
+            return cambio
+
+        etiquetas = [(etq,) for etq in por_etiqueta]
+        rows = [
+            (etq, codigo, descripcion, cantidad)
+            for etq, acc in por_etiqueta.items()
+            for (codigo, descripcion), cantidad in acc.items()
+        ]
+        cur.executemany("DELETE FROM Linea WHERE Etiqueta = ?", etiquetas)
+        cur.executemany("INSERT OR IGNORE INTO Etiqueta (Etiqueta) VALUES (?)", etiquetas)
+        cur.executemany("INSERT OR IGNORE INTO Codigo (Codigo) VALUES (?)", [(c,) for c in dict.fromkeys(r[1] for r in rows)])
+        cur.executemany("INSERT OR IGNORE INTO Descripcion (Descripcion) VALUES (?)", [(d,) for d in dict.fromkeys(r[2] for r in rows)])
+        cur.executemany(
+            "INSERT INTO Linea (Etiqueta, Codigo, Descripcion, Cantidad, Falta) VALUES (?, ?, ?, ?, 0)",
+            rows,
+        )
+        _podar(cur)
+        cur.execute("COMMIT")
+        return True
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
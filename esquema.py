@@ -0,0 +1,101 @@
+import argparse
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+import cli
+from escritura_db import PRAGMAS_INCREMENTAL, connect_escritura, ensure_schema_v2
+from lote import bloqueo
+
+# Migración de los .db de salida al esquema 2 (escritura_db.ESQUEMA_V2): claves enteras,
+# claves ajenas e índices que cubren las consultas de la app. Las vistas con las
+# columnas de siempre (Etiqueta/Codigo/Descripcion/Linea) hacen que la app de la PDA
+# siga funcionando sin cambios. Los id de Linea y lo apuntado en Falta se conservan.
+PATRONES = ("packinglist_*.db", "cajas_azules_*.db", "dia.db")
+
+def migrar(path: Path) -> bool:
+    """Pasa un .db del esquema 1 al 2 en una transacción. False si ya estaba en el 2."""
+    with bloqueo(path):
+        conn = connect_escritura(path, PRAGMAS_INCREMENTAL)  # tiene Falta: journal en disco
+        try:
+            cur = conn.cursor()
+            cur.execute("BEGIN")
+            if cur.execute("PRAGMA user_version").fetchone()[0] >= 2:
+                cur.execute("ROLLBACK")
+                return False
+            secuencia = cur.execute("SELECT seq FROM sqlite_sequence WHERE name = 'Linea'").fetchone()
+
+            # las tablas viejas se renombran para que las vistas puedan usar sus nombres
+            for tabla in ("Etiqueta", "Codigo", "Descripcion", "Linea"):
+                cur.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}_v1")
+            ensure_schema_v2(cur)
+            # mismo orden que tenían (rowid), y los textos que solo estén en Linea también
+            cur.execute("INSERT OR IGNORE INTO Etiquetas (Etiqueta) SELECT Etiqueta FROM Etiqueta_v1 ORDER BY rowid")
+            cur.execute("INSERT OR IGNORE INTO Etiquetas (Etiqueta) SELECT Etiqueta FROM Linea_v1 ORDER BY id")
+            cur.execute("INSERT OR IGNORE INTO Codigos (Codigo) SELECT Codigo FROM Codigo_v1 ORDER BY rowid")
+            cur.execute("INSERT OR IGNORE INTO Codigos (Codigo) SELECT Codigo FROM Linea_v1 ORDER BY id")
+            cur.execute("INSERT OR IGNORE INTO Descripciones (Descripcion) SELECT Descripcion FROM Descripcion_v1 ORDER BY rowid")
+            cur.execute("INSERT OR IGNORE INTO Descripciones (Descripcion) SELECT Descripcion FROM Linea_v1 ORDER BY id")
+            cur.execute("""
+                INSERT INTO Lineas (id, etiqueta, codigo, descripcion, Cantidad, Falta)
+                SELECT l.id, e.id, c.id, d.id, l.Cantidad, l.Falta
+                FROM Linea_v1 l
+                JOIN Etiquetas e ON e.Etiqueta = l.Etiqueta
+                JOIN Codigos c ON c.Codigo = l.Codigo
+                JOIN Descripciones d ON d.Descripcion = l.Descripcion
+                ORDER BY l.id
+            """)
+            for tabla in ("Linea", "Etiqueta", "Codigo", "Descripcion"):
+                cur.execute(f"DROP TABLE {tabla}_v1")
+            if secuencia is not None:
+                # los id borrados no se reutilizan, igual que con la tabla vieja
+                cur.execute("DELETE FROM sqlite_sequence WHERE name = 'Lineas'")
+                cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('Lineas', MAX(?, IFNULL((SELECT MAX(id) FROM Lineas), 0)))",
+                            secuencia)
+            cur.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        # los textos repetidos ya no están: compactar el archivo
+        conn = sqlite3.connect(str(path))
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migra los .db de salida al esquema 2 (normalizado)")
+    parser.add_argument("-o", "--out", type=Path, required=True, help="carpeta raíz de salida (Tienda_<x>/<fecha>/...)")
+    args = parser.parse_args(argv)
+
+    if not args.out.is_dir():
+        print(f"error: {args.out} no es una carpeta", file=sys.stderr)
+        return cli.EXIT_USO
+    migrados = ya = fallos = 0
+    for patron in PATRONES:
+        for db in sorted(args.out.glob(f"Tienda_*/*/db/{patron}")):
+            antes = db.stat().st_size
+            try:
+                hecho = migrar(db)
+            except (sqlite3.Error, TimeoutError) as e:
+                print(json.dumps({"db": str(db), "ok": False, "reason": f"{type(e).__name__}: {e}"},
+                                 ensure_ascii=False), flush=True)
+                fallos += 1
+                continue
+            if hecho:
+                migrados += 1
+                print(json.dumps({"db": str(db), "ok": True, "bytes_antes": antes,
+                                  "bytes": db.stat().st_size}, ensure_ascii=False), flush=True)
+            else:
+                ya += 1
+    print(json.dumps({"migrados": migrados, "ya_en_esquema_2": ya, "fallos": fallos}), file=sys.stderr)
+    return cli.EXIT_FALLOS if fallos else cli.EXIT_OK
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import cli
+from conciliacion import fuentes
+
+# Exportación columnar para análisis: en vez de abrir cientos de .db pequeños, un
+# archivo por tienda/día con todas sus líneas (RF626A y RF625A), particionado como
+# el árbol de salida pero con nombres Hive (tienda=<x>/fecha=<y>) para que pyarrow,
+# DuckDB o Spark poden por tienda y día sin leer nada:
+#   <out_root>/export/tienda=<x>/fecha=<y>/lineas.parquet   (con pyarrow)
+#   <out_root>/export/tienda=<x>/fecha=<y>/lineas.csv       (sin pyarrow)
+# tienda y fecha van en la ruta (columnas de partición), no dentro del archivo.
+# Cada día se rehace entero desde sus .db: reprocesar un PDF no duplica filas.
+EXPORT_DIR = "export"
+FILAS_GRUPO = 65536  # filas por row group de Parquet (y por escritura)
+COLUMNAS = ("tipo", "etiqueta", "albaran", "codigo", "descripcion", "cantidad", "falta")
+
+def hay_parquet() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _filas(db: Path):
+    """Filas de COLUMNAS de un .db de salida, en el orden en que se escribieron."""
+    if db.name.startswith("cajas_azules_"):
+        tipo, albaran = "RF625A", db.stem.split("_alb_", 1)[1]
+    else:
+        tipo, albaran = "RF626A", None
+    conn = sqlite3.connect(f"{db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        cur = conn.execute("SELECT Etiqueta, Codigo, Descripcion, Cantidad, Falta FROM Linea ORDER BY id")
+        while True:
+            bloque = cur.fetchmany(FILAS_GRUPO)
+            if not bloque:
+                return
+            yield [(tipo, etq, albaran, codigo, descripcion, cantidad, falta)
+                   for etq, codigo, descripcion, cantidad, falta in bloque]
+    finally:
+        conn.close()
+
+def _escribir_csv(bloques, tmp: Path):
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNAS)
+        for bloque in bloques:
+            w.writerows(bloque)
+
+def _escribir_parquet(bloques, tmp: Path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ("tipo", pa.string()), ("etiqueta", pa.string()), ("albaran", pa.string()),
+        ("codigo", pa.string()), ("descripcion", pa.string()),
+        ("cantidad", pa.int64()), ("falta", pa.int64()),
+    ])
+    with pq.ParquetWriter(str(tmp), esquema, compression="zstd") as w:
+        pendientes = []
+        for bloque in bloques:
+            pendientes += bloque
+            if len(pendientes) >= FILAS_GRUPO:
+                w.write_table(_tabla(pa, esquema, pendientes))
+                pendientes = []
+        if pendientes:
+            w.write_table(_tabla(pa, esquema, pendientes))
+
+def _tabla(pa, esquema, filas):
+    columnas = list(zip(*filas))
+    return pa.Table.from_arrays([pa.array(c, type=t) for c, t in zip(columnas, esquema.types)], schema=esquema)
+
+def exportar_dia(db_folder: Path, out_root: Path, formato: str = None) -> dict:
+    """
+    Rehace el archivo de export del día de tienda de `db_folder` (Tienda_<x>/<fecha>/db).
+    formato: "parquet" / "csv"; por defecto parquet si está pyarrow.
+    """
+    formato = formato or ("parquet" if hay_parquet() else "csv")
+    t0 = time.perf_counter()
+    fecha, tienda = db_folder.parent.name, db_folder.parent.parent.name[len("Tienda_"):]
+    destino = Path(out_root) / EXPORT_DIR / f"tienda={tienda}" / f"fecha={fecha}"
+    destino.mkdir(parents=True, exist_ok=True)
+
+    cajas, packing = fuentes(db_folder)
+    filas = 0
+
+    def _bloques():
+        nonlocal filas
+        for db in cajas + packing:
+            for bloque in _filas(db):
+                filas += len(bloque)
+                yield bloque
+
+    out = destino / f"lineas.{formato}"
+    tmp = destino / f".lineas.{formato}.tmp"
+    try:
+        (_escribir_parquet if formato == "parquet" else _escribir_csv)(_bloques(), tmp)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, out)  # quien lea ve el archivo viejo o el nuevo, nunca uno a medias
+    # si antes se exportó en el otro formato, fuera: el día no puede salir dos veces
+    otro = destino / f"lineas.{'csv' if formato == 'parquet' else 'parquet'}"
+    if otro.exists():
+        otro.unlink()
+    return {"export": str(out), "dbs": len(cajas) + len(packing), "filas": filas,
+            "ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+def exportar_lote(out_root: Path, dbs, formato: str = None):
+    """Exporta una vez cada día de tienda tocado por un lote (las "dbs" de sus resultados)."""
+    dias = dict.fromkeys(Path(db).parent for db in dbs)
+    return [exportar_dia(d, out_root, formato) for d in dias if d.is_dir()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta las líneas de los .db a Parquet/CSV particionado por tienda/día")
+    parser.add_argument("-o", "--out", type=Path, required=True, help="carpeta raíz de salida (Tienda_<x>/<fecha>/...)")
+    parser.add_argument("--tienda", help="solo esta tienda (por defecto todas)")
+    parser.add_argument("--fecha", help="solo este día, YYYY-MM-DD (por defecto todos)")
+    parser.add_argument("--formato", choices=("parquet", "csv"),
+                        help="por defecto parquet si está instalado pyarrow, si no csv")
+    args = parser.parse_args(argv)
+
+    if args.formato == "parquet" and not hay_parquet():
+        print("error: --formato parquet necesita pyarrow (pip install pyarrow)", file=sys.stderr)
+        return cli.EXIT_USO
+    if not args.out.is_dir():
+        print(f"error: {args.out} no es una carpeta", file=sys.stderr)
+        return cli.EXIT_USO
+    patron = f"Tienda_{args.tienda or '*'}/{args.fecha or '*'}/db"
+    for db_folder in sorted(args.out.glob(patron)):
+        if any(fuentes(db_folder)):
+            print(json.dumps(exportar_dia(db_folder, args.out, args.formato), ensure_ascii=False), flush=True)
+    return cli.EXIT_OK
+
+if __name__ == "__main__":
+    raise SystemExit(main())
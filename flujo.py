@@ -0,0 +1,69 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+# Extracción, SQLite y archivos solapados en vez de uno detrás de otro:
+# - Escritor: hilo que escribe los .db según la extracción le va cerrando etiquetas,
+#   con una cola acotada (si SQLite va más lento, la extracción espera).
+# - en_fondo: una tarea suelta en otro hilo (mover el PDF mientras se extrae).
+# fitz y sqlite3 sueltan el GIL en su parte C, así que los hilos sí se solapan.
+COLA_MAX = 4  # trabajos de escritura en vuelo
+
+class Escritor:
+    """
+    enviar(fn, *args) encola un trabajo; el hilo los hace en orden. El primer error
+    se relanza en el siguiente enviar() o al cerrar (y el resto de la cola se descarta).
+    """
+    def __init__(self, maxsize: int = COLA_MAX):
+        self.cola = queue.Queue(maxsize)
+        self.error = None
+        self.hilo = threading.Thread(target=self._bucle, name="escritor-db", daemon=True)
+        self.hilo.start()
+
+    def _bucle(self):
+        while True:
+            trabajo = self.cola.get()
+            if trabajo is None:
+                return
+            if self.error is None:
+                fn, args = trabajo
+                try:
+                    fn(*args)
+                except BaseException as e:
+                    self.error = e
+
+    def enviar(self, fn, *args):
+        if self.error is not None:
+            raise self.error
+        self.cola.put((fn, args))
+
+    def cerrar(self):
+        self.cola.put(None)
+        self.hilo.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        if tipo is None:
+            self.cerrar()
+        else:
+            # ya sale una excepción: esperar al hilo sin taparla
+            self.cola.put(None)
+            self.hilo.join()
+        return False
+
+def en_fondo(fn, *args) -> Future:
+    """fn(*args) en un hilo aparte; .result() espera y relanza su error."""
+    fut = Future()
+
+    def _correr():
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=_correr, daemon=True).start()
+    return fut
@@ -0,0 +1,235 @@
+import argparse
+import random
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+# PDFs sintéticos RF626A / RF625A con la misma maquetación que los reales
+# (Courier 8, 4.8 pt por carácter, 12 pt de interlineado, página 950x792, dos
+# columnas). Sirven de fixtures y para probar a escala: cada generar_* devuelve
+# también lo que el parser TIENE que sacar ({etiqueta: {(codigo, desc): cantidad}}).
+ANCHO, ALTO = 950, 792  # Courier 8: 4.8 pt por carácter
+PASO = 12.0       # interlineado
+Y_BASE = 20.7     # baseline de la primera línea
+FILA_ITEMS = 17   # primera línea de productos (y0 = 217)
+FILAS_PAGINA = 40 # líneas de productos por página
+
+NOMBRES = [
+    "ACTIMEL FRESA", "YOGUR NATURAL", "YOGUR GRIEGO NATURAL", "FLAN HUEVO PROTEICO",
+    "LECHE FRESCA ENTERA", "LECHE FRESCA SEMIDES", "NATILLAS CON GALLETA", "POSTRE SOJA CHOCOLAT",
+    "QUESO GOUDA CUÑA HOL", "SALCHICHAS FRANKFURT", "TARTA DE QUESO", "ARROZ CON LECHE",
+    "BÍFIDUS MANGO", "L-CASEI FRESA/COCO", "QUITAESMALT ACET PUR", "BAND DEP FACIAL ALOE",
+    "HILO DENT CERA MENTA", "BÁLSAMO LABIAL", "APÓSITOS AGUA", "CEPILLO DENTAL MEDIO",
+    "DEO SPRAY B&W MEN", "GILLETTE BLUE II FIJ", "TRAT ACEITE ARGÁN", "DESODORAN PIES SPRAY",
+]
+MARCAS = ["DIALA", "DANON", "CAPRI", "REINA", "FIDIA", "BIFID", "IMAQE", "GILLE", "BOTIK", "SELEC", ""]
+TAMANOS = ["4X125", "8X125", "1 KG", "400 G", "1 L", "P-12", "200ML", "150ML", "16UDS", "3 UDS", "1200M"]
+
+def _linea(*partes) -> str:
+    """[(columna, texto), ...] -> línea de ancho fijo."""
+    out = ""
+    for col, texto in partes:
+        out = out.ljust(col) + texto
+    return out
+
+def _pagina(doc, lineas):
+    page = doc.new_page(width=ANCHO, height=ALTO)
+    for fila, texto in lineas:
+        if texto.strip():
+            page.insert_text((0, Y_BASE + fila * PASO), texto, fontname="cour", fontsize=8)
+    return page
+
+def _catalogo(rnd, n: int, codigo_min: int):
+    """n productos (codigo, nombre, marca, tamaño) con códigos únicos."""
+    codigos = rnd.sample(range(10 ** (codigo_min - 1), 999999), n)
+    return [(str(c), rnd.choice(NOMBRES), rnd.choice(MARCAS), rnd.choice(TAMANOS)) for c in codigos]
+
+def _desc_esperada(nombre, marca, tamano) -> str:
+    return " ".join(t for t in f"{nombre} {marca} {tamano}".split())
+
+def _campo_desc(rnd, nombre, marca, tamano, ancho_nombre: int, ruido: float) -> str:
+    relleno = ancho_nombre - len(nombre)
+    if rnd.random() < ruido and relleno >= 3:
+        # puntos de relleno (limpiar() los tira)
+        hueco = " " + "." * (relleno - 2) + " "
+    else:
+        hueco = " " * relleno
+    return f"{nombre}{hueco} {marca:<5} {tamano:<5}"
+
+def _codigo(rnd, codigo: str, ancho: int, duplicados: float) -> str:
+    # código repetido ("297243 297243"): el resto de la línea se desplaza
+    if rnd.random() < duplicados:
+        return f"{codigo:>{ancho}} {codigo}"
+    return f"{codigo:>{ancho}}"
+
+def _fecha_hora(fecha: date):
+    return fecha.strftime("%d/%m/%y"), datetime.now().strftime("%H:%M:%S")
+
+# ---------- RF626A ----------
+def _cabecera_rf626a(tienda, fecha, albaran, etiqueta, pagina):
+    f, h = _fecha_hora(fecha)
+    return [
+        (0, _linea((0, "SISTEMA .:  GETAFE"), (84, "LISTADO CONTENIDO POR FORMATO"), (169, f"Fecha ..: {f}"))),
+        (1, _linea((0, "CPD-RF626A"), (84, "-" * 29), (169, f"Hora ...: {h}"))),
+        (2, _linea((0, "COD. ALMACEN ..........:   2  MAD GETAFE"), (169, f"Pagina .:{pagina:>6}"))),
+        (3, _linea((0, "EMPRESA: DIA RETAIL ESPAÑA, S.A.U."), (60, "A80782519"),
+                   (78, f"TIENDA/CONCESION..: {tienda}/00"))),
+        (4, _linea((9, "C/JACINTO BENAVENTE,2A TRIPARK"), (78, "DIRECCION.........: AV ABRANTES 40"))),
+        (5, _linea((9, "LAS ROZAS"))),
+        (6, _linea((9, "28232. MADRID"))),
+        (8, _linea((0, f"NUMERO DE ALBARAN ..........: {albaran}"))),
+        (9, _linea((0, "NUMERO TOTAL DE CONTENEDORES :        1"))),
+        (11, _linea((0, "Area ...........:  REFRIGERADO"), (64, "PARTICION  ....:       1"))),
+        (12, _linea((0, "CONTENEDOR  ....:  H0"), (64, f"ETIQUETA   ....:   {etiqueta}"))),
+        (14, _linea((66, "Total"), (171, "Total"))),
+        (15, _linea(*[(c + o, t) for o in (0, 105) for c, t in (
+            (5, "Codigo"), (14, "Descripcion"), (47, "Cantidad"), (56, "Formato"),
+            (65, "Unidades"), (74, "Falta"), (80, "Otros"), (86, "Remonte"))])),
+        (16, _linea(*[(c + o, t) for o in (0, 105) for c, t in (
+            (5, "-" * 6), (13, "-" * 32), (47, "-" * 8), (56, "-" * 7),
+            (65, "-" * 8), (74, "-" * 5), (81, "-" * 3), (86, "-" * 7))])),
+    ]
+
+def _item_rf626a(rnd, prod, cantidad, ruido, duplicados) -> str:
+    codigo, nombre, marca, tamano = prod
+    fmt = rnd.choice("BU")
+    unidades = cantidad * rnd.choice((1, 2, 4, 6, 8, 12))
+    return (
+        "     " + _codigo(rnd, codigo, 7, duplicados) + " "
+        + _campo_desc(rnd, nombre, marca, tamano, 20, ruido)
+        + f"{cantidad:>9}     {fmt}{unidades:>13}"
+    )
+
+def generar_rf626a(path, paginas=10, etiquetas=3, ruido=0.1, duplicados=0.05,
+                   tienda="14196", fecha=None, seed=1, filas=FILAS_PAGINA, columnas=2):
+    """
+    RF626A de `paginas` páginas repartidas entre `etiquetas` etiquetas (cada
+    etiqueta ocupa páginas seguidas). Devuelve {etiqueta: {(codigo, desc): cantidad}}.
+    filas: líneas de productos por página; columnas=1: solo la columna izquierda
+    (etiquetas con pocos productos).
+    """
+    rnd = random.Random(seed)
+    fecha = fecha or date.today()
+    albaran = f"1-{rnd.randint(2000000, 2999999)}"
+    catalogo = _catalogo(rnd, 400, 2)
+    base_etq = rnd.randint(20021500000, 20021599999)
+    etiquetas = max(1, min(etiquetas, paginas))
+
+    esperado = {}
+    doc = fitz.open()
+    for n in range(paginas):
+        etq = str(base_etq + n * etiquetas // paginas)
+        acc = esperado.setdefault(etq, {})
+        lineas = _cabecera_rf626a(tienda, fecha, albaran, etq, n + 1)
+        for fila in range(filas):
+            lados = []
+            for _ in range(columnas if fila < filas - 1 or rnd.random() < 0.5 else 1):
+                prod = rnd.choice(catalogo)
+                cantidad = rnd.randint(1, 4)
+                k = (prod[0], _desc_esperada(*prod[1:]))
+                acc[k] = acc.get(k, 0) + cantidad
+                lados.append(_item_rf626a(rnd, prod, cantidad, ruido, duplicados))
+            lineas.append((FILA_ITEMS + fila, "".join(l.ljust(105) for l in lados).rstrip()))
+        _pagina(doc, lineas)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return esperado
+
+# ---------- RF625A ----------
+def _cabecera_rf625a(tienda, fecha, albaran, pagina):
+    f, h = _fecha_hora(fecha)
+    return [
+        (0, _linea((0, "SISTEMA .:"), (84, "LISTADO CAJAS DE PREPARACION EN UNIDADES"), (169, f"Fecha ..: {f}"))),
+        (1, _linea((0, "CPD-RF625A"), (84, "-" * 40), (169, f"Hora ...: {h}"))),
+        (2, _linea((0, "COD. ALMACEN ..........:  73"), (169, f"Pagina .:{pagina:>6}"))),
+        (3, _linea((0, "COD. ALMACEN DESTINO ..:   2  MAD GETAFE"))),
+        (4, _linea((0, "EMPRESA: DIA RETAIL ESPAÑA, S.A.U."), (60, "A80782519"),
+                   (78, f"TIENDA/CONCESION..: {tienda}/00"))),
+        (5, _linea((9, "C/JACINTO BENAVENTE,2A TRIPARK"),
+                   (78, "DIRECCION.........: AV NUESTRA SEÑORA DE VALVANERA 79"))),
+        (6, _linea((9, "LAS ROZAS"))),
+        (7, _linea((9, "28232. MADRID"))),
+        (9, _linea((0, f"NUMERO DE ALBARAN ..........: {albaran}"))),
+        (10, _linea((0, "NUMERO TOTAL DE CAJAS ......:     1"))),
+        (12, _linea((0, "Area ...........:  UNITARIO ILLESCAS"))),
+        (13, _linea((0, "Caja de plastico:  000000000000001498"))),
+        (15, _linea(*[(c + o, t) for o in (0, 93) for c, t in (
+            (5, "Codigo"), (15, "Descripcion"), (61, "Cantidad"), (71, "Formato"),
+            (80, "Falta"), (87, "Otros"))])),
+        (16, _linea(*[(c + o, t) for o in (0, 93) for c, t in (
+            (5, "-" * 6), (14, "-" * 44), (61, "-" * 8), (71, "-" * 7),
+            (80, "-" * 5), (87, "-" * 3))])),
+    ]
+
+def _item_rf625a(rnd, prod, cantidad, ruido, duplicados) -> str:
+    codigo, nombre, marca, tamano = prod
+    return (
+        "     " + _codigo(rnd, codigo, 7, duplicados) + "  "
+        + _campo_desc(rnd, nombre, marca, tamano, 32, ruido)
+        + f"{cantidad:>11}     {rnd.choice('UB')}"
+    )
+
+def generar_rf625a(path, paginas=1, ruido=0.1, duplicados=0.05,
+                   tienda="14196", fecha=None, seed=1):
+    """
+    RF625A (una caja / albarán) de `paginas` páginas.
+    Devuelve {"<tienda>_<albaran>": {(codigo, desc): cantidad}} como cajas_azules.
+    """
+    rnd = random.Random(seed)
+    fecha = fecha or date.today()
+    alb = rnd.randint(100000, 999999)
+    catalogo = _catalogo(rnd, 400, 3)
+
+    acc = {}
+    doc = fitz.open()
+    for n in range(paginas):
+        lineas = _cabecera_rf625a(tienda, fecha, f"0- {alb}", n + 1)
+        for fila in range(FILAS_PAGINA):
+            lados = []
+            for _ in range(2):
+                prod = rnd.choice(catalogo)
+                cantidad = rnd.randint(1, 4)
+                k = (prod[0], _desc_esperada(*prod[1:]))
+                acc[k] = acc.get(k, 0) + cantidad
+                lados.append(_item_rf625a(rnd, prod, cantidad, ruido, duplicados))
+            lineas.append((FILA_ITEMS + fila, "".join(l.ljust(93) for l in lados).rstrip()))
+        if n == paginas - 1:
+            fila = FILA_ITEMS + FILAS_PAGINA + 2
+            lineas.append((fila, _linea((10, f"Total cantidad ......{sum(acc.values()):>13}"))))
+            lineas.append((fila + 2, _linea((87, "* * * FIN LISTADO * * *"))))
+        _pagina(doc, lineas)
+    doc.save(str(path), garbage=3, deflate=True)
+    doc.close()
+    return {f"{tienda}_0-{alb}": acc}
+
+GENERADORES = {"RF626A": generar_rf626a, "RF625A": generar_rf625a}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera PDFs RF626A/RF625A sintéticos")
+    parser.add_argument("carpeta", type=Path)
+    parser.add_argument("--formato", choices=tuple(GENERADORES), default="RF626A")
+    parser.add_argument("-n", type=int, default=1, help="cuántos PDFs")
+    parser.add_argument("--paginas", type=int, default=10)
+    parser.add_argument("--etiquetas", type=int, default=3, help="etiquetas por PDF (solo RF626A)")
+    parser.add_argument("--ruido", type=float, default=0.1, help="fracción de líneas con puntos de relleno")
+    parser.add_argument("--duplicados", type=float, default=0.05, help="fracción de códigos repetidos")
+    parser.add_argument("--tienda", default="14196")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    args.carpeta.mkdir(parents=True, exist_ok=True)
+    for i in range(args.n):
+        path = args.carpeta / f"{args.formato}____sintetico_{args.seed + i:06d}.pdf"
+        kwargs = dict(paginas=args.paginas, ruido=args.ruido, duplicados=args.duplicados,
+                      tienda=args.tienda, seed=args.seed + i)
+        if args.formato == "RF626A":
+            kwargs["etiquetas"] = args.etiquetas
+        esperado = GENERADORES[args.formato](path, **kwargs)
+        filas = sum(len(acc) for acc in esperado.values())
+        print(f"✅ {path.name}: {args.paginas} páginas, {len(esperado)} etiquetas, {filas} productos")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
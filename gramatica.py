@@ -0,0 +1,78 @@
+import re
+
+# Gramática de una "mitad" de línea (columna izquierda o derecha):
+#   [basura] CODIGO DESCRIPCION... CANTIDAD (B|U) [UNIDADES] ...
+# La limpieza (puntos de relleno + repetidos) es una sola pasada sin regex por token;
+# el resto son dos búsquedas con regex precompiladas sobre la línea limpia, sin
+# índices de tokens ni tokens.pop. Mismo resultado que el viejo clean_tokens +
+# bucles (ver `python benchmarks.py gramatica`).
+
+# motivos de rechazo (diagnostico.Diagnostico los cuenta por formato y página)
+VACIA = "vacia"                     # nada tras limpiar (mitad de línea en blanco)
+SIN_CODIGO = "sin_codigo"           # ningún token numérico con largo de código
+SIN_CANTIDAD = "sin_cantidad"       # código, pero sin patrón CANTIDAD (B|U)
+SIN_DESCRIPCION = "sin_descripcion" # cantidad pegada al código
+MOTIVOS = (VACIA, SIN_CODIGO, SIN_CANTIDAD, SIN_DESCRIPCION)
+
+def limpiar(tokens) -> str:
+    """
+    clean_tokens + " ".join en una pasada: fuera tokens con "..." o solo puntos,
+    y fuera repetidos seguidos ("297243 297243" -> "297243").
+    """
+    out, prev = [], None
+    for t in tokens:
+        if t == prev or "..." in t or not t.strip("."):
+            continue
+        out.append(t)
+        prev = t
+    return " ".join(out)
+
+class Gramatica:
+    """
+    codigo_min..12 dígitos para el código (el PRIMER token numérico de ese largo).
+    cantidad: regex del patrón cantidad (grupo 1) + formato.
+    desde_codigo: True si la búsqueda de la cantidad empieza en el propio código
+    (packing list genérico) y no en el token siguiente (RF626A/RF625A).
+    """
+    def __init__(self, nombre: str, codigo_min: int, cantidad: str, desde_codigo: bool = False):
+        self.nombre = nombre
+        self.re_codigo = re.compile(rf"(?<!\S)\d{{{codigo_min},12}}(?!\S)")
+        self.re_cantidad = re.compile(cantidad)
+        self.desde_codigo = desde_codigo
+
+    def parse(self, tokens, diag=None):
+        """
+        tokens de una mitad de línea -> (codigo, descripcion, cantidad) o None.
+        diag: diagnostico.Diagnostico o None; solo se toca si viene (sin coste si no).
+        """
+        linea = limpiar(tokens)
+
+        m = self.re_codigo.search(linea)
+        if m is None:
+            if diag is not None:
+                diag.rechazo(self.nombre, SIN_CODIGO if linea else VACIA, tokens)
+            return None
+
+        q = self.re_cantidad.search(linea, m.start() if self.desde_codigo else m.end() + 1)
+        if q is None:
+            if diag is not None:
+                diag.rechazo(self.nombre, SIN_CANTIDAD, tokens)
+            return None
+
+        # cantidad pegada al código (o el propio código como cantidad): sin descripción
+        if q.start() <= m.end() + 1:
+            if diag is not None:
+                diag.rechazo(self.nombre, SIN_DESCRIPCION, tokens)
+            return None
+        descripcion = linea[m.end() + 1 : q.start() - 1]
+
+        if diag is not None:
+            diag.aceptada(self.nombre)
+        return m.group(), descripcion, int(q.group(1))
+
+# RF626A: CODIGO ... CANTIDAD (B/U) UNIDADES (códigos desde 2 dígitos)
+RF626A = Gramatica("RF626A", 2, r"(?<!\S)(\d+) [BU] \d+(?!\S)")
+# RF625A: CODIGO ... CANTIDAD (U/B), sin columna de unidades
+RF625A = Gramatica("RF625A", 3, r"(?<!\S)(\d+) [BU](?!\S)")
+# packing list de batch_convert.py: como RF626A pero códigos desde 3 dígitos
+PACKINGLIST = Gramatica("packinglist", 3, r"(?<!\S)(\d+) [BU] \d+(?!\S)", desde_codigo=True)
@@ -0,0 +1,353 @@
+import os
+import socket
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, repeat
+from pathlib import Path
+
+from acumulador import Acumulador
+from escritura_db import leer_acc, write_db, write_db_incremental, write_dia_db
+from metricas import SIN_METRICAS, Metricas, emitir
+from registro import sha256_file
+
+LOCK_TIMEOUT = 120.0  # segundos esperando un cerrojo antes de rendirse
+LOCK_STALE = 600.0    # .lock sin dueño comprobable (vacío, u otra máquina) más viejo que esto: huérfano
+
+# ---------- cerrojos entre procesos ----------
+def _vivo(pid: int) -> bool:
+    """¿Sigue vivo el proceso pid (en esta máquina)?"""
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        h = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not h:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: existe, de otro usuario
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(h, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(h)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # existe, de otro usuario
+    return True
+
+def _huerfano(lock: Path) -> bool:
+    """
+    El .lock guarda "pid máquina" de quien lo tiene. Huérfano si ese proceso ya no
+    existe; sin dueño comprobable (recién creado y aún vacío, u otra máquina en una
+    carpeta compartida) solo si tiene más de LOCK_STALE segundos.
+    """
+    contenido = lock.read_text(encoding="utf-8", errors="replace").split()
+    if len(contenido) == 2 and contenido[0].isdigit() and contenido[1] == socket.gethostname():
+        return not _vivo(int(contenido[0]))
+    return time.time() - lock.stat().st_mtime > LOCK_STALE
+
+@contextmanager
+def bloqueo(path: Path, timeout: float = LOCK_TIMEOUT):
+    """
+    Cerrojo por archivo: crea "<path>.lock" en modo exclusivo.
+    O_CREAT|O_EXCL es atómico en Windows y Linux, así que no hace falta fcntl/msvcrt.
+    Un .lock de un proceso que murió sin borrarlo se quita (ver _huerfano): el mtime
+    no sirve, nada lo refresca mientras el cerrojo sigue tomado.
+    """
+    lock = Path(str(path) + ".lock")
+    t0 = time.monotonic()
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if _huerfano(lock):
+                    lock.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            except PermissionError:
+                pass  # Windows: el dueño lo está creando o borrando ahora mismo
+            if time.monotonic() - t0 > timeout:
+                raise TimeoutError(f"No se pudo bloquear {path} (¿{lock.name} huérfano?)")
+            time.sleep(0.05)
+
+    try:
+        os.write(fd, f"{os.getpid()} {socket.gethostname()}".encode("utf-8"))
+        yield
+    finally:
+        os.close(fd)
+        try:
+            lock.unlink()
+        except FileNotFoundError:
+            pass
+
+# ---------- fusión de etiquetas entre PDFs del lote ----------
+class Diferido:
+    """
+    Lo que devuelve un process_doc(..., diferir=True): el resultado de siempre, sin
+    DBs escritas todavía, y lo que hay que escribir. Las escribe el lote (Fusion).
+    """
+    def __init__(self, resultado, etiquetas, dia_db=None):
+        self.resultado = resultado  # (tienda, fecha, dest_pdf, out_dbs)
+        self.etiquetas = etiquetas  # [(etq, .db de la etiqueta o None, {(codigo, descripcion): cantidad})]
+        self.dia_db = dia_db        # dia.db de su tienda/día, o None
+
+class Fusion:
+    """
+    (tienda, fecha, etiqueta) -> un Acumulador con las líneas de TODOS los PDFs del
+    lote. Una etiqueta repetida en dos PDFs (reimpresión, o partida en dos trabajos)
+    se suma en vez de que el segundo write_db pise al primero, y cada .db se
+    escribe una sola vez, al final del lote.
+    incremental: las DBs que ya existen se actualizan con el delta y conservan Falta.
+    metricas: destino de las métricas ("-" = stdout, o un .jsonl); None = sin métricas.
+    Los PDFs diferidos no escriben nada, así que escribir_db y db_bytes salen aquí,
+    en una línea por lote (con "lote": los PDFs que se fusionaron).
+    """
+    def __init__(self, incremental: bool = False, metricas: str = None):
+        self.incremental = incremental
+        self.metricas = metricas
+        self.etiquetas = {}  # (tienda, fecha, etq) -> Acumulador
+        self.destinos = {}   # (tienda, fecha, etq) -> .db de la etiqueta (None con --salida dia)
+        self.dias = {}       # (tienda, fecha) -> dia.db
+        self.sembradas = set()  # claves que ya parten de lo escrito por un PDF saltado
+        self.pdfs = []          # PDFs sumados (para la línea de métricas)
+
+    def sumar(self, diferido: Diferido):
+        tienda, fecha = diferido.resultado[0], diferido.resultado[1]
+        self.pdfs.append(Path(diferido.resultado[2]).name)
+        for etq, out_db, acc in diferido.etiquetas:
+            clave = (tienda, fecha, etq)
+            dst = self.etiquetas.get(clave)
+            if dst is None:
+                dst = self.etiquetas[clave] = Acumulador()
+                self.destinos[clave] = out_db
+            for (codigo, descripcion), cantidad in acc.items():
+                dst.sumar(codigo, descripcion, cantidad)
+        if diferido.dia_db is not None:
+            self.dias.setdefault((tienda, fecha), diferido.dia_db)
+
+    def sembrar(self, resultado):
+        """
+        resultado registrado de un PDF del lote que se salta (ya procesado): las
+        etiquetas suyas que también traen los PDFs nuevos parten de lo que ya está
+        escrito en su .db (o en dia.db), y la fusión no pisa sus líneas.
+        Después de sumar todos los Diferido del lote y antes de escribir.
+        """
+        if not isinstance(resultado, tuple):
+            return
+        tienda, fecha, _, out_dbs = resultado
+        suyas = {Path(p).resolve() for p in out_dbs}
+        for clave, acc in list(self.etiquetas.items()):
+            if clave[:2] != (tienda, fecha) or clave in self.sembradas:
+                continue
+            escrito = self.destinos[clave] or self.dias.get((tienda, fecha))
+            if escrito is None or Path(escrito).resolve() not in suyas or not Path(escrito).exists():
+                continue
+            with bloqueo(escrito):
+                previo = leer_acc(escrito, clave[2])
+            # lo ya escrito primero: sus líneas conservan el orden (y los id) de antes
+            sembrada = Acumulador()
+            for (codigo, descripcion), cantidad in chain(previo.items(), acc.items()):
+                sembrada.sumar(codigo, descripcion, cantidad)
+            self.etiquetas[clave] = sembrada
+            self.sembradas.add(clave)
+
+    def escribir(self):
+        # cerrojo por DB: otro lote (otro proceso) puede traer la misma etiqueta
+        m = SIN_METRICAS if self.metricas is None else Metricas()
+        escritas, ok = [], False
+        try:
+            with m.etapa("escribir_db"):
+                for clave, acc in self.etiquetas.items():
+                    out_db = self.destinos[clave]
+                    if out_db is not None:
+                        with bloqueo(out_db):
+                            (write_db_incremental if self.incremental else write_db)(clave[2], acc, out_db)
+                        escritas.append(out_db)
+                for (tienda, fecha), dia_db in self.dias.items():
+                    por_etiqueta = {etq: acc for (t, f, etq), acc in self.etiquetas.items() if (t, f) == (tienda, fecha)}
+                    with bloqueo(dia_db):
+                        write_dia_db(por_etiqueta, dia_db, incremental=self.incremental)
+                    escritas.append(dia_db)
+            ok = True
+        finally:
+            if self.metricas is not None:
+                m.contar("pdfs", len(self.pdfs))
+                m.contar("dbs", len(escritas))
+                m.contar("db_bytes", sum(Path(p).stat().st_size for p in escritas))
+                emitir(m.a_dict(ok=ok, lote=self.pdfs), self.metricas)
+            self.descartar()  # aunque falle: el lote siguiente empieza de cero
+
+    def descartar(self):
+        self.etiquetas, self.destinos, self.dias, self.sembradas, self.pdfs = {}, {}, {}, set(), []
+
+# ---------- lote ----------
+def _devolver(dest_pdf: Path, pdf: Path):
+    # PDF ya movido a Tienda_<x>/<fecha>/pdfs sin sus DBs: otra vez a la entrada
+    if dest_pdf.exists() and not pdf.exists():
+        dest_pdf.replace(pdf)
+
+def procesar_lote(process_pdf, pdfs, out_root: Path, workers: int = 1, registro=None, force: bool = False,
+                  executor=None, fusion: Fusion = None):
+    """
+    Ejecuta process_pdf(pdf, out_root) para cada PDF y va devolviendo
+    (pdf, resultado, saltado) en el MISMO orden que `pdfs` (generador),
+    aunque los workers terminen desordenados.
+
+    workers <= 1 -> en serie, sin pool (igual que antes).
+    process_pdf tiene que ser una función de módulo (se pasa por pickle a los workers).
+    registro (registro.Registro): PDFs idénticos ya procesados con este parser se
+    saltan (saltado=True, resultado guardado) salvo force=True. Solo el proceso
+    padre escribe en el registro.
+    Un PDF repetido dentro del mismo lote (mismo contenido, aunque cambie el nombre)
+    se ignora: sale saltado=True con el resultado del primero.
+    executor: pool ya arrancado (modo vigilante); si viene, no se crea ni se cierra aquí.
+    fusion: si viene (los process_pdf devuelven Diferido), las etiquetas de todo el
+    lote se juntan y se escriben una vez; los resultados salen al final del lote.
+    Si la escritura falla, los PDFs nuevos del lote vuelven a la entrada sin
+    registrar y la excepción sigue hacia arriba.
+    """
+    pdfs = [Path(p) for p in pdfs]
+
+    hashes, previos, primero = {}, {}, {}
+    for p in pdfs:
+        hashes[p] = sha256_file(p)
+        primero.setdefault(hashes[p], p)
+        if registro is not None and not force:
+            res = registro.buscar(hashes[p])
+            if res is not None:
+                previos[p] = res
+
+    def _hecho(p, res):
+        if registro is not None:
+            registro.registrar(hashes[p], p.name, res)
+        return p, res, False
+
+    pendientes = [p for p in pdfs if p not in previos and primero[hashes[p]] == p]
+    hechos = {}  # primer PDF de cada contenido -> resultado (para sus repetidos)
+
+    def _en_orden(resultado_de):
+        for p in pdfs:
+            if p in previos:
+                yield p, previos[p], True
+            elif primero[hashes[p]] != p:
+                yield p, hechos[primero[hashes[p]]], True
+            else:
+                res = hechos[p] = resultado_de(p)
+                yield p, res, None  # None: recién hecho (se registra al devolverlo)
+
+    def _salida(en_orden):
+        if fusion is None:
+            for p, res, saltado in en_orden:
+                yield _hecho(p, res) if saltado is None else (p, res, saltado)
+            return
+        lote = []
+        try:
+            for p, res, saltado in en_orden:
+                if isinstance(res, Diferido):
+                    fusion.sumar(res)
+                    res = hechos[p] = res.resultado
+                lote.append((p, res, saltado))
+            for p, res, saltado in lote:
+                if p in previos:
+                    fusion.sembrar(res)
+            fusion.escribir()  # las DBs existen antes de registrar/devolver nada
+        except BaseException:
+            fusion.descartar()
+            for p, res, saltado in lote:
+                if saltado is None and isinstance(res, tuple):
+                    _devolver(res[2], p)
+            raise
+        for p, res, saltado in lote:
+            yield _hecho(p, res) if saltado is None else (p, res, saltado)
+
+    if executor is not None:
+        futures = {p: executor.submit(process_pdf, p, out_root) for p in pendientes}
+        yield from _salida(_en_orden(lambda p: futures[p].result()))
+        return
+
+    if workers <= 1 or len(pendientes) <= 1:
+        yield from _salida(_en_orden(lambda p: process_pdf(p, out_root)))
+        return
+
+    workers = min(workers, len(pendientes))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futures = {p: ex.submit(process_pdf, p, out_root) for p in pendientes}
+        yield from _salida(_en_orden(lambda p: futures[p].result()))
+
+# ---------- páginas de un mismo PDF en paralelo ----------
+MIN_PAGES_PARALELO = 40  # por debajo no compensa arrancar procesos
+
+def rangos_paginas(n_pages: int, partes: int):
+    """Parte [0, n_pages) en `partes` rangos contiguos (start, stop) del mismo tamaño."""
+    partes = max(1, min(partes, n_pages))
+    base, resto = divmod(n_pages, partes)
+    out, start = [], 0
+    for i in range(partes):
+        stop = start + base + (1 if i < resto else 0)
+        out.append((start, stop))
+        start = stop
+    return out
+
+def merge_por_etiqueta(parciales):
+    """
+    Junta los acumuladores parciales EN ORDEN de rango. Así el orden de inserción
+    (etiquetas y productos) es el mismo que recorriendo el PDF en serie, y los
+    ids de Linea salen idénticos.
+    """
+    por_etiqueta = defaultdict(Acumulador)
+    for parcial in parciales:
+        for etq, acc in parcial.items():
+            dst = por_etiqueta[etq]
+            for (codigo, descripcion), cantidad in acc.items():
+                dst.sumar(codigo, descripcion, cantidad)
+    return por_etiqueta
+
+def acumular_paralelo(acumular_rango, pdf_path: Path, n_pages: int, workers: int, diag=None):
+    """
+    acumular_rango(pdf_path, start, stop) -> {etq: {(codigo, descripcion): cantidad}}
+    Cada worker abre su propio fitz sobre su rango (los docs de fitz no se comparten
+    entre procesos).
+    diag: diagnostico.Diagnostico del PDF (--diagnostico); entonces acumular_rango
+    devuelve (parcial, Diagnostico.estado()) y los rechazos se mezclan aquí.
+    """
+    rangos = rangos_paginas(n_pages, workers)
+    with ProcessPoolExecutor(max_workers=len(rangos)) as ex:
+        parciales = ex.map(
+            acumular_rango,
+            repeat(str(pdf_path)),
+            [a for a, _ in rangos],
+            [b for _, b in rangos],
+        )
+        if diag is not None:
+            parciales = list(parciales)
+            for _, estado in parciales:  # en orden de rango: por_pagina sale ordenado
+                diag.mezclar(estado)
+            parciales = [parcial for parcial, _ in parciales]
+        return merge_por_etiqueta(parciales)
+
+def workers_arg(parser):
+    parser.add_argument(
+        "--workers", type=int, default=1, metavar="N",
+        help="procesos en paralelo (1 = en serie; 0 = todos los núcleos)",
+    )
+    parser.add_argument(
+        "--page-workers", type=int, default=1, metavar="N",
+        help=f"reparte las páginas de cada PDF entre N procesos (PDFs de >= {MIN_PAGES_PARALELO} páginas)",
+    )
+
+def registro_arg(parser):
+    parser.add_argument(
+        "--force", action="store_true",
+        help="reprocesa aunque el PDF ya esté en el registro de ingesta",
+    )
+
+def resolve_workers(n: int) -> int:
+    return (os.cpu_count() or 1) if n <= 0 else n
@@ -0,0 +1,80 @@
+try:
+    import numpy as np
+except ImportError:  # sin numpy: mismo algoritmo en Python puro (más lento)
+    np = None
+
+# Agrupado de words en líneas y columnas.
+# Antes: round(y0 / TOL_Y) * TOL_Y en un dict -> dos palabras de la misma línea a
+# ambos lados del borde de un "cubo" caían en líneas distintas, y TOL_Y=2.0 era a ojo.
+# Ahora: se ordena por y0 y se corta donde el salto en y0 supera una tolerancia
+# sacada del propio documento (media altura de palabra mediana).
+TOL_Y_DEFECTO = 2.0
+FRACCION_ALTURA = 0.5  # tolerancia = 0.5 * altura mediana de palabra (interlineado ~1.2 alturas)
+
+def tolerancia_y(words) -> float:
+    """Tolerancia vertical para un documento, a partir de las words de una página."""
+    if not words:
+        return TOL_Y_DEFECTO
+    if np is not None:
+        alturas = np.fromiter((w[3] - w[1] for w in words), dtype=np.float64, count=len(words))
+        mediana = float(np.median(alturas))
+    else:
+        alturas = sorted(w[3] - w[1] for w in words)
+        mediana = alturas[len(alturas) // 2]
+    return FRACCION_ALTURA * mediana if mediana > 0 else TOL_Y_DEFECTO
+
+def agrupar_lineas(words, split_x: float, tol: float):
+    """
+    words de get_text("words") -> [(tokens_izquierda, tokens_derecha), ...] de arriba
+    a abajo, cada lado ordenado por x. Una línea nueva empieza donde y0 salta más de `tol`.
+    """
+    if not words:
+        return []
+    if np is None:
+        return _agrupar_python(words, split_x, tol)
+
+    n = len(words)
+    x0 = np.fromiter((w[0] for w in words), dtype=np.float64, count=n)
+    y0 = np.fromiter((w[1] for w in words), dtype=np.float64, count=n)
+
+    # 1) orden por y0, cortes donde el salto supera la tolerancia -> id de línea
+    por_y = np.argsort(y0, kind="stable")
+    linea = np.empty(n, dtype=np.int64)
+    linea[por_y] = np.concatenate(([0], np.cumsum(np.diff(y0[por_y]) > tol)))
+
+    # 2) orden final: línea, columna (izq/der), x -- un solo lexsort
+    derecha = x0 >= split_x
+    orden = np.lexsort((x0, derecha, linea))
+
+    # 3) cortes de grupo (línea, lado) sin recorrer palabra por palabra
+    clave = linea[orden] * 2 + derecha[orden]
+    cortes = np.flatnonzero(np.diff(clave)) + 1
+    textos = [words[i][4] for i in orden.tolist()]
+
+    lados = {}
+    inicios = [0] + cortes.tolist()
+    finales = cortes.tolist() + [n]
+    for (a, b), k in zip(zip(inicios, finales), clave[inicios].tolist()):
+        lados[k] = textos[a:b]
+
+    return [(lados.get(2 * l, []), lados.get(2 * l + 1, [])) for l in range(int(linea.max()) + 1)]
+
+def _agrupar_python(words, split_x, tol):
+    # desempates por índice original, igual que el lexsort estable de numpy
+    por_y = sorted(range(len(words)), key=lambda i: words[i][1])
+    lineas, ultimo_y = [], None
+    for i in por_y:
+        y = words[i][1]
+        if ultimo_y is None or y - ultimo_y > tol:
+            lineas.append([])
+        lineas[-1].append(i)
+        ultimo_y = y
+
+    out = []
+    for idx in lineas:
+        idx.sort(key=lambda i: (words[i][0], i))
+        out.append((
+            [words[i][4] for i in idx if words[i][0] < split_x],
+            [words[i][4] for i in idx if words[i][0] >= split_x],
+        ))
+    return out
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Modo de memoria acotada (--memoria-acotada) para impresiones consolidadas enormes.
+# En RF626A las páginas de una etiqueta van seguidas: en cuanto la etiqueta cambia,
+# la anterior se escribe y se suelta. Solo si una etiqueta vuelve a salir más adelante
+# su total se lleva en un agregado temporal en disco (Derrame), no en memoria.
+# pico_rss_mb() va en las métricas para comprobar la cota.
+
+def pico_rss_mb():
+    """Pico de RSS del proceso en MB (None donde no hay `resource`, p. ej. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB, macOS en bytes
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def liberar_mupdf():
+    """Vacía la caché de MuPDF (fuentes y objetos de las páginas ya leídas)."""
+    import fitz  # PyMuPDF
+    fitz.TOOLS.store_shrink(100)
+
+class Derrame:
+    """
+    (etiqueta, codigo, descripcion) -> cantidad en un sqlite temporal. acc(etq) da el
+    total en orden de primera aparición, igual que el defaultdict en memoria.
+    Lo usa un hilo cada vez (el escritor), pero se cierra desde el que lo creó:
+    check_same_thread=False.
+    """
+    def __init__(self, carpeta=None):
+        fd, self.path = tempfile.mkstemp(prefix="derrame_", suffix=".db", dir=carpeta)
+        os.close(fd)
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = OFF")  # temporal: si falla, se tira
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("""
+            CREATE TABLE Agregado (
+                orden INTEGER PRIMARY KEY,
+                Etiqueta TEXT NOT NULL,
+                Codigo TEXT NOT NULL,
+                Descripcion TEXT NOT NULL,
+                Cantidad INTEGER NOT NULL,
+                UNIQUE (Etiqueta, Codigo, Descripcion)
+            )
+        """)
+        self.etiquetas = set()
+
+    def __contains__(self, etq) -> bool:
+        return etq in self.etiquetas
+
+    def sumar(self, etq, acc):
+        # upsert: una clave nueva va al final (orden), una repetida suma en su sitio
+        self.etiquetas.add(etq)
+        self.conn.execute("BEGIN")
+        self.conn.executemany(
+            "INSERT INTO Agregado (Etiqueta, Codigo, Descripcion, Cantidad) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (Etiqueta, Codigo, Descripcion) DO UPDATE SET Cantidad = Cantidad + excluded.Cantidad",
+            ((etq, codigo, descripcion, cantidad) for (codigo, descripcion), cantidad in acc.items()),
+        )
+        self.conn.execute("COMMIT")
+
+    def acc(self, etq) -> dict:
+        cur = self.conn.execute(
+            "SELECT Codigo, Descripcion, Cantidad FROM Agregado WHERE Etiqueta = ? ORDER BY orden", (etq,)
+        )
+        return {(codigo, descripcion): cantidad for codigo, descripcion, cantidad in cur}
+
+    def cerrar(self):
+        self.conn.close()
+        os.remove(self.path)
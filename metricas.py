@@ -0,0 +1,92 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from memoria import pico_rss_mb
+
+# Tiempos por etapa (wall + CPU) y contadores de un PDF, como una línea JSON.
+# Barato para dejarlo siempre puesto: dos relojes por etapa y página, nada más.
+# El CPU de cada etapa es el del hilo que la ejecuta (thread_time): las etapas del
+# hilo escritor y del que mueve el PDF corren a la vez que la extracción y no se
+# cuentan dos veces. El cpu_s total del PDF sí es el de todo el proceso.
+# Sin --metricas el pipeline usa SIN_METRICAS (no hace nada), así que las llamadas
+# a metricas.etapa()/contar() no necesitan ningún if.
+# Con --diagnostico, metricas.diag es un diagnostico.Diagnostico (motivos de rechazo
+# del parser); si no, None y Gramatica.parse no hace nada extra.
+# rss_pico_mb: pico de memoria del proceso hasta ese PDF (en un lote, el máximo de
+# los PDFs que ya hizo ese proceso); None en Windows.
+
+class Metricas:
+    def __init__(self, pdf: str = "", diagnostico: bool = False):
+        self.pdf = pdf
+        self.diag = None
+        if diagnostico:
+            from diagnostico import Diagnostico
+            self.diag = Diagnostico()
+        self.etapas = {}                     # nombre -> [wall_s, cpu_s, veces]
+        self.contadores = defaultdict(int)   # paginas, lineas, items, productos, dbs, db_bytes...
+        self.inicio = (time.perf_counter(), time.process_time())
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        w0, c0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            e = self.etapas.get(nombre)
+            if e is None:
+                e = self.etapas[nombre] = [0.0, 0.0, 0]
+            e[0] += time.perf_counter() - w0
+            e[1] += time.thread_time() - c0
+            e[2] += 1
+
+    def contar(self, nombre: str, n: int = 1):
+        self.contadores[nombre] += n
+
+    def a_dict(self, **extra) -> dict:
+        w0, c0 = self.inicio
+        return {
+            "tipo": "metricas",
+            "pdf": self.pdf,
+            "pid": os.getpid(),
+            **extra,
+            "wall_s": round(time.perf_counter() - w0, 6),
+            "cpu_s": round(time.process_time() - c0, 6),
+            "rss_pico_mb": pico_rss_mb(),
+            "etapas": {
+                k: {"wall_s": round(w, 6), "cpu_s": round(c, 6), "veces": n}
+                for k, (w, c, n) in self.etapas.items()
+            },
+            "contadores": dict(self.contadores),
+            **({"diagnostico": self.diag.a_dict()} if self.diag is not None else {}),
+        }
+
+class _SinMetricas:
+    _nulo = nullcontext()
+    diag = None
+
+    def etapa(self, nombre: str):
+        return self._nulo
+
+    def contar(self, nombre: str, n: int = 1):
+        pass
+
+SIN_METRICAS = _SinMetricas()
+
+def emitir(registro: dict, destino: str):
+    """
+    destino "-" = stdout (junto a las líneas de resultado, con "tipo": "metricas");
+    si no, se añade una línea al archivo. Un solo write con O_APPEND: los workers
+    pueden escribir en el mismo archivo sin cerrojo.
+    """
+    linea = json.dumps(registro, ensure_ascii=False) + "\n"
+    if destino == "-":
+        print(linea, end="", flush=True)
+        return
+    fd = os.open(destino, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, linea.encode("utf-8"))
+    finally:
+        os.close(fd)
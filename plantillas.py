@@ -0,0 +1,150 @@
+import json
+import os
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+
+import gramatica
+from lote import bloqueo
+from maquetacion import agrupar_lineas
+
+# Plantillas de columnas: dónde cortar izquierda/derecha para cada formato y tamaño
+# de página. Antes era width/2 en cada página, y en RF625A el código de la columna
+# derecha empieza justo en x = width/2 (475 de 950): un pelo a la izquierda y la línea
+# se rompía. Ahora se aprende el "pasillo" entre columnas con un histograma en x de las
+# palabras de las líneas de producto, se guarda en disco y se reutiliza.
+PLANTILLAS_JSON = "plantillas_columnas.json"  # en la raíz de salida
+BANDA = (0.3, 0.7)   # el pasillo se busca en esta franja del ancho
+MARGEN = 2.0         # pt libres a cada lado del corte para dar la plantilla por buena
+FORMATOS_CANTIDAD = ("B", "U")  # las líneas de producto llevan B/U (formato)
+GRAMATICAS = {g.nombre: g for g in (gramatica.RF626A, gramatica.RF625A, gramatica.PACKINGLIST)}
+
+def _clave(formato: str, width: float, height: float) -> str:
+    return f"{formato}|{round(width)}x{round(height)}"
+
+def _cajas_producto(words, tol: float):
+    """(x0, x1) de las palabras en líneas de producto (las que tienen un token B/U)."""
+    ys = sorted(w[1] for w in words if w[4] in FORMATOS_CANTIDAD)
+    if not ys:
+        return []
+    cajas = []
+    for w in words:
+        i = bisect_left(ys, w[1] - tol)
+        if i < len(ys) and ys[i] <= w[1] + tol:
+            cajas.append((w[0], w[2]))
+    return cajas
+
+def aprender_split(words, width: float, tol: float):
+    """
+    Corte entre columnas a partir del histograma de ocupación en x de las líneas de
+    producto: el tramo vacío más ancho dentro de BANDA que tenga palabras a los dos
+    lados (si la página tiene una sola columna no se aprende nada -> None).
+    Devuelve el centro del tramo.
+    """
+    cajas = _cajas_producto(words, tol)
+    if not cajas:
+        return None
+    n = int(width) + 2
+    ocupado = [0] * n
+    for x0, x1 in cajas:
+        a, b = max(0, int(x0)), min(n - 1, int(x1) + 1)
+        ocupado[a] += 1
+        ocupado[b] -= 1
+    lo, hi = int(width * BANDA[0]), int(width * BANDA[1])
+
+    mejor, inicio, acumulado = None, None, 0
+    for x in range(n):
+        acumulado += ocupado[x]
+        if acumulado == 0 and inicio is None:
+            inicio = x
+        elif acumulado != 0 and inicio is not None:
+            # tramo vacío [inicio, x): tiene palabras a los dos lados (x > inicio > 0)
+            if inicio > 0 and inicio < hi and x > lo and (mejor is None or x - inicio > mejor[1] - mejor[0]):
+                mejor = (inicio, x)
+            inicio = None
+    if mejor is None:
+        return None
+    return (mejor[0] + mejor[1]) / 2.0
+
+def encaja(words, split_x: float, tol: float) -> bool:
+    """Ninguna palabra de producto cae a menos de MARGEN del corte."""
+    a, b = split_x - MARGEN, split_x + MARGEN
+    return not any(x0 < b and x1 > a for x0, x1 in _cajas_producto(words, tol))
+
+def separa_columnas(words, split_x: float, tol: float, formato: str, ambos: bool = True) -> bool:
+    """
+    El corte deja al menos un producto completo (CODIGO ... CANTIDAD B/U) a cada lado.
+    En una página de una sola columna el pasillo más ancho cae DENTRO de la columna
+    (entre descripción y cantidad): ese corte no deja ningún producto a la izquierda.
+    ambos=False: basta un producto completo en cualquiera de los dos lados (la última
+    página de una etiqueta puede traer solo la columna izquierda).
+    """
+    g = GRAMATICAS[formato]
+    izquierda = derecha = False
+    for izq, der in agrupar_lineas(words, split_x, tol):
+        izquierda = izquierda or (bool(izq) and g.parse(izq) is not None)
+        derecha = derecha or (bool(der) and g.parse(der) is not None)
+        if (izquierda and derecha) or (not ambos and (izquierda or derecha)):
+            return True
+    return False
+
+# ---------- almacén ----------
+class Plantillas:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sucio = False
+        try:
+            self.datos = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.datos = {}
+
+    def split_x(self, formato: str, page, words, tol: float) -> float:
+        """
+        Corte para esta página: el de la plantilla si encaja y deja productos completos
+        (aunque sea en una sola columna); si no, se reaprende, y un corte nuevo solo se
+        guarda si separa dos columnas de productos. Si tampoco sale (una sola columna,
+        o sin productos) -> width/2 para esta página, sin guardar nada.
+        """
+        width, height = float(page.rect.width), float(page.rect.height)
+        clave = _clave(formato, width, height)
+        guardado = self.datos.get(clave)
+        if (guardado is not None and encaja(words, guardado["split_x"], tol)
+                and separa_columnas(words, guardado["split_x"], tol, formato, ambos=False)):
+            return guardado["split_x"]
+
+        nuevo = aprender_split(words, width, tol)
+        if nuevo is None or not separa_columnas(words, nuevo, tol, formato):
+            return width / 2.0
+        self.recordar(clave, {"split_x": nuevo})
+        return nuevo
+
+    def recordar(self, clave: str, valor: dict):
+        # otras plantillas en el mismo almacén (p.ej. la banda de cabecera)
+        self.datos[clave] = {**valor, "aprendido": datetime.now().isoformat(timespec="seconds")}
+        self.sucio = True
+
+    def guardar(self):
+        if not self.sucio:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with bloqueo(self.path):
+            # otro proceso pudo aprender otras claves mientras tanto: se mezclan
+            try:
+                en_disco = json.loads(self.path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, ValueError):
+                en_disco = {}
+            en_disco.update(self.datos)
+            tmp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(en_disco, indent=1, sort_keys=True), encoding="utf-8")
+            tmp.replace(self.path)
+        self.sucio = False
+
+_abiertas = {}
+
+def abrir(out_root: Path) -> Plantillas:
+    """Una instancia por proceso y raíz de salida (se lee el JSON una vez por lote)."""
+    path = Path(out_root) / PLANTILLAS_JSON
+    key = str(path.resolve())
+    if key not in _abiertas:
+        _abiertas[key] = Plantillas(path)
+    return _abiertas[key]
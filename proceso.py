@@ -0,0 +1,323 @@
+from collections import defaultdict
+from functools import partial
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import plantillas
+from acumulador import Acumulador
+from cabecera import Cabecera
+from escritura_db import DIA_DB, esquema_de, leer_acc, write_db, write_db_incremental, write_dia_db
+from flujo import Escritor, en_fondo
+from lote import MIN_PAGES_PARALELO, Diferido, acumular_paralelo, bloqueo
+from maquetacion import agrupar_lineas, tolerancia_y
+from memoria import Derrame, liberar_mupdf
+from metricas import SIN_METRICAS, Metricas
+
+# Proceso de los PDFs con etiqueta por página (RF626A de convertir_pdf.py y el packing
+# list genérico de batch_convert.py): páginas -> etiquetas -> un .db por etiqueta y/o
+# dia.db, con --page-workers, memoria acotada, fusión del lote e incremental.
+# Lo único que cambia entre los dos es un Formato: gramática de las líneas, regex de
+# cabecera y nombre de los .db. Cada script arma el suyo y llama a process_pdf/process_doc.
+
+class Formato:
+    """
+    gramatica: gramatica.Gramatica de las líneas; su nombre es también la clave de
+    las plantillas (columnas y cabecera).
+    re_tienda: la cabecera de la página 0 tiene que traer esto (Cabecera.texto).
+    re_etiqueta / etiqueta_defecto: la etiqueta de cada página (grupo 1).
+    get_tienda / get_fecha: texto de cabecera -> "14196" / "2026-01-09".
+    prefijo_db: <prefijo>_<tienda>_<fecha>_etq_<etiqueta>.db (lo que lee la app).
+    mover: True = el PDF sale de la entrada / False = solo se copia.
+    """
+    def __init__(self, gramatica, re_tienda, re_etiqueta, etiqueta_defecto, get_tienda, get_fecha,
+                 prefijo_db: str = "packinglist", mover: bool = True):
+        self.gramatica = gramatica
+        self.re_tienda = re_tienda
+        self.re_etiqueta = re_etiqueta
+        self.etiqueta_defecto = etiqueta_defecto
+        self.get_tienda = get_tienda
+        self.get_fecha = get_fecha
+        self.prefijo_db = prefijo_db
+        self.mover = mover
+
+    @property
+    def nombre(self) -> str:
+        return self.gramatica.nombre
+
+# ---------- páginas ----------
+def extraer_items(gramatica, page, words=None, tol=None, split_x=None, metricas=SIN_METRICAS):
+    """(codigo, descripcion, cantidad) de las dos columnas de una página."""
+    if words is None:
+        words = page.get_text("words")
+    if tol is None:
+        tol = tolerancia_y(words)
+    if split_x is None:  # sin plantilla: mitad de la página
+        split_x = float(page.rect.width) / 2.0
+
+    diag = metricas.diag  # None salvo --diagnostico
+    if diag is not None:
+        diag.pagina = page.number
+    with metricas.etapa("agrupar"):
+        lineas = agrupar_lineas(words, split_x, tol)
+    items = []
+    with metricas.etapa("parse"):
+        for left, right in lineas:
+            for side in (left, right):
+                parsed = gramatica.parse(side, diag)
+                if parsed:
+                    items.append(parsed)
+    metricas.contar("lineas", len(lineas))
+    metricas.contar("items", len(items))
+    return items
+
+def acumular_paginas(formato: Formato, doc, start=0, stop=None, first_words=None, plantillas_col=None,
+                     metricas=SIN_METRICAS, al_cerrar=None, liberar=False, tol=None):
+    # por_etiqueta -> (codigo,descripcion)->cantidad de las páginas [start, stop)
+    # first_words: words de la página 0 si ya se extrajeron (cabecera)
+    # tol: tolerancia de líneas del documento (None = la de la página 0, aunque el
+    # rango empiece más adelante: cada rango de --page-workers usa la misma)
+    # plantillas_col: plantillas.Plantillas para el corte de columnas (None = width/2)
+    # al_cerrar(etq, acc): en cuanto la etiqueta deja de salir (otra etiqueta o fin del
+    # rango); si vuelve a salir más adelante, se llama otra vez con el total
+    # liberar: tras al_cerrar la etiqueta sale de por_etiqueta (si vuelve a salir,
+    # al_cerrar recibe solo el tramo nuevo)
+    por_etiqueta = defaultdict(Acumulador)  # textos internados para todo el lote
+    cab = Cabecera(formato.nombre, formato.re_etiqueta, formato.etiqueta_defecto, plantillas_col)
+    if tol is None:
+        if first_words is None:
+            with metricas.etapa("texto"):
+                first_words = doc[0].get_text("words")
+        tol = tolerancia_y(first_words)
+    anterior = None
+    for page in doc.pages(start, stop):
+        if page.number == 0 and first_words is not None:
+            words = first_words
+        else:
+            with metricas.etapa("texto"):
+                words = page.get_text("words")  # única pasada por el motor de texto
+        with metricas.etapa("cabecera"):
+            etq = cab.etiqueta(page, words, tol)  # solo la banda de cabecera, y nada si no cambió
+        if etq != anterior:
+            if al_cerrar is not None and anterior in por_etiqueta:
+                al_cerrar(anterior, por_etiqueta[anterior])
+                if liberar:
+                    del por_etiqueta[anterior]
+            anterior = etq
+        split_x = None
+        if plantillas_col is not None:
+            with metricas.etapa("plantilla"):
+                split_x = plantillas_col.split_x(formato.nombre, page, words, tol)
+        metricas.contar("paginas")
+
+        for codigo, descripcion, cantidad in extraer_items(formato.gramatica, page, words, tol, split_x, metricas):
+            por_etiqueta[etq].sumar(codigo, descripcion, cantidad)
+    if al_cerrar is not None and anterior in por_etiqueta:
+        al_cerrar(anterior, por_etiqueta[anterior])
+        if liberar:
+            del por_etiqueta[anterior]
+    return por_etiqueta
+
+def _acumular_rango(formato: Formato, pdf_path, start, stop, out_root=None, tol=None, diagnostico=False):
+    # worker de --page-workers: su propio doc, y dicts normales (pickle)
+    # tol: la del documento (process_doc), no la de la primera página del rango
+    # diagnostico: devuelve también los rechazos del rango (Diagnostico.estado())
+    col = plantillas.abrir(out_root) if out_root is not None else None
+    metricas = Metricas(diagnostico=True) if diagnostico else SIN_METRICAS
+    with fitz.open(pdf_path) as doc:
+        por_etiqueta = acumular_paginas(formato, doc, start, stop, plantillas_col=col, metricas=metricas, tol=tol)
+    if col is not None:
+        col.guardar()
+    parcial = {etq: acc.a_dict() for etq, acc in por_etiqueta.items()}
+    return (parcial, metricas.diag.estado()) if diagnostico else parcial
+
+def _mover_pdf(pdf_path: Path, dest_pdf: Path, mover: bool = True, metricas=SIN_METRICAS) -> bool:
+    # mover/copy PDF (cerrojo: otro worker puede traer un PDF con el mismo nombre);
+    # True si el PDF salió de la entrada (movido, no copiado)
+    with metricas.etapa("mover"):
+        if pdf_path.resolve() == dest_pdf.resolve():
+            return False
+        with bloqueo(dest_pdf):
+            try:
+                if mover:
+                    pdf_path.replace(dest_pdf)
+                    return True
+                import shutil
+                shutil.copy2(pdf_path, dest_pdf)
+            except Exception:
+                # bloqueado o sin permisos: se copia
+                import shutil
+                shutil.copy2(pdf_path, dest_pdf)
+        return False
+
+# ---------- un PDF ----------
+def process_pdf(formato: Formato, pdf_path: Path, out_root: Path, page_workers: int = 1, salida: str = "etiqueta",
+                memoria_acotada: bool = False, diferir: bool = False, incremental: bool = False,
+                metricas=SIN_METRICAS):
+    with metricas.etapa("abrir"):
+        doc = fitz.open(str(pdf_path))
+    try:
+        return process_doc(formato, doc, pdf_path, out_root, page_workers=page_workers, salida=salida,
+                           memoria_acotada=memoria_acotada, diferir=diferir, incremental=incremental,
+                           metricas=metricas)
+    finally:
+        if not doc.is_closed:  # process_doc lo cierra al terminar la extracción
+            doc.close()
+
+def process_doc(formato: Formato, doc, pdf_path: Path, out_root: Path, first_words=None, page_workers: int = 1,
+                salida: str = "etiqueta", memoria_acotada: bool = False, diferir: bool = False,
+                incremental: bool = False, metricas=SIN_METRICAS):
+    # doc ya abierto (despachador): first_words = words de la página 0 si ya se sacaron.
+    # process_doc lo cierra en cuanto termina la extracción, para poder mover el PDF;
+    # quien lo abrió solo lo cierra si sigue abierto (un error antes)
+    # salida: "etiqueta" = un .db por etiqueta / "dia" = db/dia.db / "ambos"
+    # memoria_acotada: cada etiqueta se escribe y se suelta al terminar sus páginas
+    # (las que vuelven a salir, en un agregado temporal en disco; ver memoria.py)
+    # diferir: no escribe ninguna DB; devuelve lote.Diferido y el lote junta las
+    # etiquetas de todos sus PDFs (lote.Fusion). Con memoria_acotada no se difiere.
+    # incremental: los .db que ya existen se actualizan con el delta (escritura_db.
+    # write_db_incremental) y conservan Falta. Cada etiqueta se escribe una sola vez,
+    # ya completa (nada de escrituras parciales por el camino); no va con memoria_acotada.
+    # metricas: metricas.Metricas para tiempos por etapa y contadores (--metricas)
+    if first_words is None:
+        with metricas.etapa("texto"):
+            first_words = doc[0].get_text("words")
+    col = plantillas.abrir(out_root)
+    with metricas.etapa("cabecera"):
+        cab = Cabecera(formato.nombre, plantillas_col=col)
+        tol = tolerancia_y(first_words)  # una tolerancia de líneas por documento (página 0)
+        first_text = cab.texto(doc[0], first_words, tol, requiere=formato.re_tienda)
+
+    tienda = formato.get_tienda(first_text)
+    fecha = formato.get_fecha(first_text)
+
+    tienda_folder = out_root / f"Tienda_{tienda}"
+    day_folder = tienda_folder / fecha
+    pdfs_folder = day_folder / "pdfs"
+    db_folder = day_folder / "db"
+    pdfs_folder.mkdir(parents=True, exist_ok=True)
+    db_folder.mkdir(parents=True, exist_ok=True)
+
+    def ruta_etiqueta(etq):
+        return db_folder / f"{formato.prefijo_db}_{tienda}_{fecha}_etq_{etq}.db"
+
+    # escribir DB(s) (cerrojo por DB: dos PDFs pueden traer la misma etiqueta)
+    escritas = set()  # solo la toca el hilo escritor
+
+    def escribir_etiqueta(etq, acc):
+        out_db = ruta_etiqueta(etq)
+        with metricas.etapa("escribir_db"), bloqueo(out_db):
+            if incremental:
+                if not write_db_incremental(etq, acc, out_db):
+                    metricas.contar("dbs_sin_cambios")
+                return
+            esquema = None
+            if etq in escritas:
+                # la etiqueta volvió a salir: el .db anterior es de este PDF; de cero,
+                # para que los id de Linea queden como si se escribiera una vez
+                # (en su mismo esquema)
+                esquema = esquema_de(out_db)
+                out_db.unlink()
+            write_db(etq, acc, out_db, esquema)
+        escritas.add(etq)
+
+    def escribir_dia(por_etiqueta):
+        out_db = db_folder / DIA_DB
+        with metricas.etapa("escribir_db"), bloqueo(out_db):
+            if not write_dia_db(por_etiqueta, out_db, incremental=incremental):
+                metricas.contar("dbs_sin_cambios")
+
+    productos = {}   # etq -> productos escritos (en modo acotado por_etiqueta se vacía)
+    derrame = None   # memoria.Derrame, solo si alguna etiqueta vuelve a salir
+
+    def escribir_acotada(etq, acc):
+        # modo acotado: acc es solo el último tramo de páginas de la etiqueta
+        nonlocal derrame
+        if etq in productos:
+            # volvió a salir: el total sigue en disco, empezando por lo ya escrito
+            if derrame is None:
+                derrame = Derrame()
+            if etq not in derrame:
+                escrito = ruta_etiqueta(etq) if por_db else db_folder / DIA_DB
+                with bloqueo(escrito):
+                    derrame.sumar(etq, leer_acc(escrito, etq))
+            derrame.sumar(etq, acc)
+            acc = derrame.acc(etq)
+        if por_db:
+            escribir_etiqueta(etq, acc)
+        if salida in ("dia", "ambos"):
+            escribir_dia({etq: acc})
+        productos[etq] = len(acc)
+
+    def cerrar_acotada(etq, acc):
+        escritor.enviar(escribir_acotada, etq, acc)  # acc ya no está en por_etiqueta
+        liberar_mupdf()
+
+    # extracción -> cola acotada -> hilo escritor: cada etiqueta se escribe en cuanto
+    # la extracción pasa a otra, mientras sigue con las páginas siguientes. El PDF se
+    # mueve al terminar la extracción, ya cerrado (en Windows MuPDF lo abre sin
+    # FILE_SHARE_DELETE y no se puede renombrar abierto), a la vez que las últimas DBs
+    dest_pdf = pdfs_folder / pdf_path.name
+    # (memoria acotada: en serie; los workers devuelven todas sus etiquetas de golpe)
+    paralelo = page_workers > 1 and len(doc) >= MIN_PAGES_PARALELO and not memoria_acotada
+    por_db = salida in ("etiqueta", "ambos")
+    diferir = diferir and not memoria_acotada
+    incremental = incremental and not memoria_acotada
+    mover = None
+    try:
+        with Escritor() as escritor:
+            # por_etiqueta -> (codigo,descripcion)->cantidad
+            if paralelo:
+                # los workers no devuelven tiempos ni contadores: solo el total, las
+                # páginas y (con --diagnostico) sus rechazos
+                with metricas.etapa("paginas_paralelo"):
+                    rango = partial(_acumular_rango, formato, out_root=out_root, tol=tol,
+                                    diagnostico=metricas.diag is not None)
+                    por_etiqueta = acumular_paralelo(rango, pdf_path, len(doc), page_workers, metricas.diag)
+                metricas.contar("paginas", len(doc))
+                if por_db and not diferir:
+                    for etq, acc in por_etiqueta.items():
+                        escritor.enviar(escribir_etiqueta, etq, acc)
+            elif memoria_acotada:
+                por_etiqueta = acumular_paginas(formato, doc, first_words=first_words, plantillas_col=col,
+                                                metricas=metricas, al_cerrar=cerrar_acotada, liberar=True, tol=tol)
+                col.guardar()
+            else:
+                # copia: si la etiqueta vuelve a salir, su acc sigue creciendo aquí
+                al_vuelo = por_db and not diferir and not incremental
+                al_cerrar = (lambda etq, acc: escritor.enviar(escribir_etiqueta, etq, acc.copia())) if al_vuelo else None
+                por_etiqueta = acumular_paginas(formato, doc, first_words=first_words, plantillas_col=col,
+                                                metricas=metricas, al_cerrar=al_cerrar, tol=tol)
+                col.guardar()
+                if por_db and not diferir and incremental:
+                    for etq, acc in por_etiqueta.items():
+                        escritor.enviar(escribir_etiqueta, etq, acc)
+            doc.close()  # process_doc es el último que lo usa (ver arriba)
+            mover = en_fondo(_mover_pdf, pdf_path, dest_pdf, formato.mover, metricas)
+            if not memoria_acotada:
+                productos = {etq: len(acc) for etq, acc in por_etiqueta.items()}
+                if salida in ("dia", "ambos") and not diferir:
+                    escritor.enviar(escribir_dia, por_etiqueta)
+        mover.result()
+    except BaseException:
+        # sin extracción completa o sin sus DBs, el PDF vuelve a la entrada
+        if mover is not None and mover.exception() is None and mover.result():
+            dest_pdf.replace(pdf_path)
+        raise
+    finally:
+        if derrame is not None:  # el hilo escritor ya terminó
+            derrame.cerrar()
+    metricas.contar("productos", sum(productos.values()))
+
+    out_dbs = [db_folder / DIA_DB] if salida in ("dia", "ambos") else []
+    if por_db:
+        out_dbs += [ruta_etiqueta(etq) for etq in productos]
+    metricas.contar("dbs", len(out_dbs))
+    if diferir:
+        # aún no existen: las escribe el lote al final
+        etiquetas = [(etq, ruta_etiqueta(etq) if por_db else None, acc.a_dict()) for etq, acc in por_etiqueta.items()]
+        dia_db = db_folder / DIA_DB if salida in ("dia", "ambos") else None
+        return Diferido((tienda, fecha, dest_pdf, out_dbs), etiquetas, dia_db)
+    metricas.contar("db_bytes", sum(p.stat().st_size for p in out_dbs))
+
+    return tienda, fecha, dest_pdf, out_dbs
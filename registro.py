@@ -0,0 +1,92 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+# Registro de PDFs ya procesados, en la raíz de salida (al lado de las Tienda_*).
+# Clave: hash del contenido + versión del parser. Si el PDF es el mismo byte a byte
+# y el parser no cambió, el resultado sería idéntico: no hace falta reprocesarlo.
+REGISTRO_DB = "registro_ingesta.db"
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _connect(out_root: Path):
+    out_root.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(out_root / REGISTRO_DB))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS Ingesta (
+            sha256 TEXT NOT NULL,
+            parser TEXT NOT NULL,
+            pdf TEXT NOT NULL,
+            resultado TEXT NOT NULL,
+            salidas TEXT NOT NULL,
+            fecha_proceso TEXT NOT NULL,
+            PRIMARY KEY (sha256, parser)
+        )
+    """)
+    return conn
+
+# ---------- (de)serialización del resultado de process_pdf ----------
+def _a_json(res):
+    # RF626A: (tienda, fecha, dest_pdf, out_dbs) / RF625A: dict
+    if isinstance(res, tuple):
+        tienda, fecha, dest_pdf, out_dbs = res
+        return {"tuple": [tienda, fecha, str(dest_pdf), [str(p) for p in out_dbs]]}
+    return {"dict": res}
+
+def _de_json(data):
+    if "tuple" in data:
+        tienda, fecha, dest_pdf, out_dbs = data["tuple"]
+        return tienda, fecha, Path(dest_pdf), [Path(p) for p in out_dbs]
+    return data["dict"]
+
+def salidas_de(res):
+    """Archivos que tienen que seguir existiendo para dar el PDF por procesado."""
+    if isinstance(res, tuple):
+        return [str(res[2])] + [str(p) for p in res[3]]
+    if res.get("ok"):
+        return [res["pdf_saved"], res["db_saved"]]
+    return []
+
+# ---------- API ----------
+class Registro:
+    def __init__(self, out_root: Path, parser: str):
+        self.parser = parser
+        self.conn = _connect(out_root)
+
+    def buscar(self, sha: str):
+        """Resultado guardado si el PDF ya se procesó y sus salidas siguen en disco."""
+        row = self.conn.execute(
+            "SELECT resultado, salidas FROM Ingesta WHERE sha256 = ? AND parser = ?",
+            (sha, self.parser),
+        ).fetchone()
+        if row is None:
+            return None
+        if not all(Path(p).exists() for p in json.loads(row[1])):
+            return None  # alguien borró DBs/PDF: reprocesar
+        return _de_json(json.loads(row[0]))
+
+    def registrar(self, sha: str, pdf_name: str, res):
+        salidas = salidas_de(res)
+        if not salidas:
+            return  # rechazado (p.ej. no es RF625A): no se registra
+        self.conn.execute(
+            "INSERT OR REPLACE INTO Ingesta (sha256, parser, pdf, resultado, salidas, fecha_proceso) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                sha, self.parser, pdf_name,
+                json.dumps(_a_json(res), ensure_ascii=False),
+                json.dumps(salidas, ensure_ascii=False),
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
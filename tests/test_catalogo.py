@@ -0,0 +1,26 @@
+import pytest
+
+import catalogo
+import convertir_pdf
+import plantillas
+from generar_pdfs import generar_rf626a
+
+@pytest.fixture
+def cat(tmp_path):
+    plantillas._abiertas.clear()
+    (tmp_path / "entrada").mkdir()
+    generar_rf626a(tmp_path / "entrada" / "uno.pdf", paginas=1, etiquetas=1, filas=3, columnas=1, seed=3)
+    convertir_pdf.process_pdf(tmp_path / "entrada" / "uno.pdf", tmp_path / "out")
+    cat = catalogo.abrir(tmp_path / "out")
+    cat.sincronizar()
+    yield cat
+    cat.close()
+
+@pytest.mark.parametrize("texto", ["FRESA/COCO", "L-CASEI", "l-cas*", "diala fresa/coco", 'FRESA"'])
+def test_buscar_texto_con_signos(cat, texto):
+    (r,) = cat.buscar(texto)
+    assert r["Descripcion"] == "L-CASEI FRESA/COCO DIALA P-12"
+
+@pytest.mark.parametrize("texto", ["B&W", 'GEL"', "AND", "(", "*", "NEAR(a b)"])
+def test_buscar_sin_error_de_sintaxis(cat, texto):
+    assert cat.buscar(texto) == []
@@ -0,0 +1,46 @@
+import sqlite3
+
+import escritura_db
+
+def test_dia_db_existente_con_journal(tmp_path, monkeypatch):
+    """Solo un dia.db nuevo va sin journal; el que ya tiene otras etiquetas, con journal en disco."""
+    usados = []
+    connect = escritura_db.connect_escritura
+
+    def espiar(out_path, pragmas=escritura_db.PRAGMAS_ESCRITURA):
+        usados.append(pragmas)
+        return connect(out_path, pragmas)
+
+    monkeypatch.setattr(escritura_db, "connect_escritura", espiar)
+    dia = tmp_path / escritura_db.DIA_DB
+    escritura_db.write_dia_db({"1": {("10", "LECHE"): 2}}, dia)
+    escritura_db.write_dia_db({"2": {("11", "PAN"): 1}}, dia)
+    assert usados == [escritura_db.PRAGMAS_ESCRITURA, escritura_db.PRAGMAS_DIA]
+
+    conn = sqlite3.connect(str(dia))
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert conn.execute("SELECT Etiqueta, Cantidad FROM Linea ORDER BY id").fetchall() == [("1", 2), ("2", 1)]
+    finally:
+        conn.close()
+
+def test_write_db_existente_con_journal(tmp_path, monkeypatch):
+    """write_db sobre un .db que ya existe (se reescribe en su sitio): journal en disco."""
+    usados = []
+    connect = escritura_db.connect_escritura
+
+    def espiar(out_path, pragmas=escritura_db.PRAGMAS_ESCRITURA):
+        usados.append(pragmas)
+        return connect(out_path, pragmas)
+
+    monkeypatch.setattr(escritura_db, "connect_escritura", espiar)
+    db = tmp_path / "packinglist_1.db"
+    escritura_db.write_db("1", {("10", "LECHE"): 2}, db)
+    escritura_db.write_db("1", {("10", "LECHE"): 3}, db)
+    assert usados == [escritura_db.PRAGMAS_ESCRITURA, escritura_db.PRAGMAS_EXISTENTE]
+
+    conn = sqlite3.connect(str(db))
+    try:
+        assert conn.execute("SELECT Etiqueta, Cantidad FROM Linea").fetchall() == [("1", 3)]
+    finally:
+        conn.close()
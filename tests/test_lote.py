@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from functools import partial
+
+import pytest
+
+import convertir_pdf
+import lote
+import plantillas
+from generar_pdfs import generar_rf626a
+from lote import Fusion, procesar_lote
+from registro import Registro
+
+def _lineas(db):
+    conn = sqlite3.connect(str(db))
+    try:
+        return {(codigo, descripcion): cantidad
+                for codigo, descripcion, cantidad in conn.execute("SELECT Codigo, Descripcion, Cantidad FROM Linea")}
+    finally:
+        conn.close()
+
+def test_fusion_con_pdf_ya_registrado(tmp_path):
+    """
+    x1 solo; luego [x1, x2] con la misma etiqueta: x1 se salta (registro) pero sus
+    líneas siguen en el .db fusionado, sumadas a las de x2.
+    """
+    plantillas._abiertas.clear()
+    out, entrada = tmp_path / "out", tmp_path / "entrada"
+    entrada.mkdir()
+    x1 = generar_rf626a(entrada / "x1.pdf", paginas=1, etiquetas=1, seed=5)
+    # misma semilla -> misma etiqueta (reimpresión parcial: otro PDF, otras líneas)
+    x2 = generar_rf626a(entrada / "x2.pdf", paginas=1, etiquetas=1, seed=5, filas=7)
+    (etq,) = x1
+    assert set(x2) == {etq}
+    shutil.copy(entrada / "x1.pdf", tmp_path / "x1.pdf")  # process_pdf lo mueve
+
+    proc = partial(convertir_pdf.process_pdf, diferir=True)
+    registro = Registro(out, "RF626A")
+    try:
+        list(procesar_lote(proc, [entrada / "x1.pdf"], out, registro=registro, fusion=Fusion()))
+        shutil.copy(tmp_path / "x1.pdf", entrada / "x1.pdf")
+        res = list(procesar_lote(proc, [entrada / "x1.pdf", entrada / "x2.pdf"], out,
+                                 registro=registro, fusion=Fusion()))
+    finally:
+        registro.close()
+    assert [saltado for _, _, saltado in res] == [True, False]
+
+    esperado = dict(x1[etq])
+    for producto, cantidad in x2[etq].items():
+        esperado[producto] = esperado.get(producto, 0) + cantidad
+    (db,) = res[1][1][3]
+    assert _lineas(db) == esperado
+
+def test_fusion_que_falla_devuelve_los_pdfs(tmp_path, monkeypatch):
+    """Si la escritura del lote falla, sus PDFs vuelven a la entrada sin registrar y se pueden reintentar."""
+    plantillas._abiertas.clear()
+    out, entrada = tmp_path / "out", tmp_path / "entrada"
+    entrada.mkdir()
+    esperado = generar_rf626a(entrada / "x1.pdf", paginas=2, etiquetas=1, seed=7)
+
+    def roto(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    proc = partial(convertir_pdf.process_pdf, diferir=True)
+    registro = Registro(out, "RF626A")
+    try:
+        fusion = Fusion()
+        with monkeypatch.context() as m:
+            m.setattr(lote, "write_db", roto)
+            with pytest.raises(sqlite3.OperationalError):
+                list(procesar_lote(proc, [entrada / "x1.pdf"], out, registro=registro, fusion=fusion))
+        assert (entrada / "x1.pdf").exists()
+        assert fusion.etiquetas == {}
+
+        (_, res, saltado), = procesar_lote(proc, [entrada / "x1.pdf"], out, registro=registro, fusion=fusion)
+    finally:
+        registro.close()
+    assert saltado is False
+    (etq,) = esperado
+    assert _lineas(res[3][0]) == esperado[etq]
+
+def test_fusion_emite_metricas_del_lote(tmp_path):
+    """Diferidos: escribir_db y db_bytes salen en una línea de métricas del lote."""
+    plantillas._abiertas.clear()
+    out, entrada = tmp_path / "out", tmp_path / "entrada"
+    entrada.mkdir()
+    generar_rf626a(entrada / "x1.pdf", paginas=1, etiquetas=1, seed=5)
+    generar_rf626a(entrada / "x2.pdf", paginas=1, etiquetas=1, seed=5, filas=7)
+    destino = tmp_path / "metricas.jsonl"
+
+    proc = partial(convertir_pdf.process_pdf, diferir=True)
+    res = list(procesar_lote(proc, [entrada / "x1.pdf", entrada / "x2.pdf"], out,
+                             fusion=Fusion(metricas=str(destino))))
+    (linea,) = [json.loads(s) for s in destino.read_text(encoding="utf-8").splitlines()]
+    assert linea["ok"] and linea["lote"] == ["x1.pdf", "x2.pdf"]
+    assert linea["etapas"]["escribir_db"]["veces"] == 1
+    (db,) = res[0][1][3]
+    assert linea["contadores"]["dbs"] == 1
+    assert linea["contadores"]["db_bytes"] == db.stat().st_size
+
+def test_bloqueo_de_proceso_muerto(tmp_path):
+    """Un .lock cuyo dueño ya no existe se quita; uno de un proceso vivo no, aunque sea viejo."""
+    hijo = subprocess.Popen([sys.executable, "-c", "pass"])
+    hijo.wait()
+    lock = tmp_path / "x.db.lock"
+    lock.write_text(f"{hijo.pid} {socket.gethostname()}", encoding="utf-8")
+    with lote.bloqueo(tmp_path / "x.db", timeout=1.0):
+        assert lock.read_text(encoding="utf-8").split()[0] == str(os.getpid())
+    assert not lock.exists()
+
+    lock.write_text(f"{os.getpid()} {socket.gethostname()}", encoding="utf-8")
+    viejo = time.time() - 2 * lote.LOCK_STALE
+    os.utime(lock, (viejo, viejo))
+    with pytest.raises(TimeoutError):
+        with lote.bloqueo(tmp_path / "x.db", timeout=0.2):
+            pass
+    assert lock.exists()
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from metricas import Metricas
+
+def test_cpu_de_etapa_es_del_hilo():
+    """Una etapa que espera no se lleva el CPU de otro hilo (escritor, mover); el total sí."""
+    m = Metricas("x.pdf")
+    listo = threading.Event()
+
+    def quemar():
+        t0 = time.perf_counter()
+        while time.perf_counter() - t0 < 0.3:
+            pass
+        listo.set()
+
+    hilo = threading.Thread(target=quemar)
+    hilo.start()
+    with m.etapa("esperar"):
+        listo.wait()
+    hilo.join()
+    d = m.a_dict()
+    assert d["etapas"]["esperar"]["cpu_s"] < 0.1
+    assert d["cpu_s"] >= 0.2
@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+
+import fitz
+import pytest
+
+import cajas_azules
+import convertir_pdf
+import plantillas
+from generar_pdfs import generar_rf625a, generar_rf626a
+
+@pytest.fixture
+def como_windows(monkeypatch):
+    """
+    Como en Windows: MuPDF abre el PDF sin FILE_SHARE_DELETE, así que renombrarlo
+    mientras algún doc lo tiene abierto falla (y _mover_pdf acabaría copiándolo).
+    """
+    abiertos = []
+    abrir, renombrar = fitz.open, Path.replace
+
+    def open_(*args, **kwargs):
+        doc = abrir(*args, **kwargs)
+        abiertos.append(doc)
+        return doc
+
+    def replace(self, target):
+        origen = Path(self).resolve()
+        if any(not d.is_closed and Path(d.name).resolve() == origen for d in abiertos):
+            raise PermissionError(f"{self} está abierto")
+        return renombrar(self, target)
+
+    monkeypatch.setattr(fitz, "open", open_)
+    monkeypatch.setattr(Path, "replace", replace)
+
+def _entrada(tmp_path, pdf):
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    shutil.copy(pdf, entrada / pdf.name)  # process_pdf lo mueve
+    return entrada / pdf.name
+
+@pytest.mark.parametrize("page_workers", [1, 2])
+def test_rf626a_sale_de_la_entrada(tmp_path, como_windows, page_workers):
+    """El PDF se mueve con el doc ya cerrado: no queda en la entrada."""
+    plantillas._abiertas.clear()
+    generar_rf626a(tmp_path / "rf626a.pdf", paginas=41, etiquetas=3, seed=3)
+    pdf = _entrada(tmp_path, tmp_path / "rf626a.pdf")
+    res = convertir_pdf.process_pdf(pdf, tmp_path / "out", page_workers=page_workers)
+    assert not pdf.exists()
+    assert Path(res[2]).exists()
+
+def test_rf625a_sale_de_la_entrada(tmp_path, como_windows):
+    plantillas._abiertas.clear()
+    generar_rf625a(tmp_path / "rf625a.pdf", paginas=2, seed=5)
+    pdf = _entrada(tmp_path, tmp_path / "rf625a.pdf")
+    res = cajas_azules.process_pdf(pdf, tmp_path / "out")
+    assert res["ok"]
+    assert not pdf.exists()
+    assert Path(res["pdf_saved"]).exists()
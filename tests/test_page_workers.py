@@ -0,0 +1,56 @@
+import shutil
+
+import fitz
+
+import convertir_pdf
+import plantillas
+from generar_pdfs import generar_rf626a
+from metricas import Metricas
+
+def _procesar(pdf, out, page_workers, metricas=None):
+    entrada = out.parent / f"entrada_{out.name}"
+    entrada.mkdir()
+    shutil.copy(pdf, entrada / pdf.name)  # process_pdf lo mueve
+    extra = {} if metricas is None else {"metricas": metricas}
+    res = convertir_pdf.process_pdf(entrada / pdf.name, out, page_workers=page_workers, **extra)
+    return {db.name: db.read_bytes() for db in res[3]}
+
+def _con_separador(tmp_path):
+    # 41 páginas (dos rangos con --page-workers 2) y la 21 con letra grande
+    plantillas._abiertas.clear()
+    generar_rf626a(tmp_path / "base.pdf", paginas=41, etiquetas=4, seed=11)
+    doc = fitz.open(tmp_path / "base.pdf")
+    doc.delete_page(21)
+    page = doc.new_page(21, width=950, height=792)
+    for i in range(4):
+        page.insert_text((60, 200 + 120 * i), f"SEPARADOR DE TRABAJO {i}", fontsize=60)
+    doc.save(tmp_path / "sep.pdf")
+    doc.close()
+    return tmp_path / "sep.pdf"
+
+def test_separador_con_letra_grande(tmp_path):
+    """
+    Página separadora con letra grande justo donde empieza el segundo rango: con
+    --page-workers cada rango usa la tolerancia de líneas de la página 0, como en serie.
+    """
+    pdf = _con_separador(tmp_path)
+    serie = _procesar(pdf, tmp_path / "serie", 1)
+    paralelo = _procesar(pdf, tmp_path / "paralelo", 2)
+    assert len(serie) == 4
+    assert paralelo == serie
+
+def test_diagnostico_con_page_workers(tmp_path):
+    """--diagnostico --page-workers: los rechazos de cada rango llegan al informe."""
+    pdf = _con_separador(tmp_path)
+    informes = []
+    for page_workers in (1, 2):
+        m = Metricas(pdf.name, diagnostico=True)
+        _procesar(pdf, tmp_path / f"out{page_workers}", page_workers, m)
+        informes.append(m.diag.a_dict())
+    serie, paralelo = informes
+    assert serie["formatos"]["RF626A"]["aceptadas"] > 0
+    assert paralelo["por_pagina"] == serie["por_pagina"]
+    for f, datos in serie["formatos"].items():
+        otro = paralelo["formatos"][f]
+        assert (otro["aceptadas"], otro["rechazos"]) == (datos["aceptadas"], datos["rechazos"])
+        assert {m: len(x) for m, x in otro["muestras"].items()} == {m: len(x) for m, x in datos["muestras"].items()}
@@ -0,0 +1,69 @@
+import json
+import sqlite3
+
+import fitz
+
+import convertir_pdf
+import plantillas
+from generar_pdfs import generar_rf626a
+from maquetacion import tolerancia_y
+
+def _lineas(dbs):
+    out = {}
+    for db in dbs:
+        conn = sqlite3.connect(str(db))
+        try:
+            for etq, codigo, descripcion, cantidad in conn.execute(
+                    "SELECT Etiqueta, Codigo, Descripcion, Cantidad FROM Linea"):
+                out.setdefault(etq, {})[(codigo, descripcion)] = cantidad
+        finally:
+            conn.close()
+    return out
+
+def test_primera_pagina_de_una_columna(tmp_path):
+    """
+    Una etiqueta corta (solo columna izquierda) como primer PDF del día: no se aprende
+    un corte dentro de la columna, y el PDF siguiente (dos columnas) sale completo.
+    """
+    plantillas._abiertas.clear()
+    out = tmp_path / "out"
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    uno = generar_rf626a(tmp_path / "a" / "uno.pdf", paginas=1, etiquetas=1, filas=3, columnas=1, seed=3)
+    dos = generar_rf626a(tmp_path / "b" / "dos.pdf", paginas=2, etiquetas=1, seed=4)
+
+    res = convertir_pdf.process_pdf(tmp_path / "a" / "uno.pdf", out)
+    assert _lineas(res[3]) == uno
+    guardadas = json.loads((out / plantillas.PLANTILLAS_JSON).read_text(encoding="utf-8"))
+    assert "RF626A|950x792" not in guardadas
+
+    res = convertir_pdf.process_pdf(tmp_path / "b" / "dos.pdf", out)
+    assert _lineas(res[3]) == dos
+
+def test_plantilla_en_pagina_de_una_columna(tmp_path):
+    """
+    Con la plantilla ya aprendida, una página de una sola columna usa el corte guardado
+    (encaja y la columna izquierda da productos) en vez de caer a width/2.
+    """
+    plantillas._abiertas.clear()
+    out = tmp_path / "out"
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    dos = generar_rf626a(tmp_path / "a" / "dos.pdf", paginas=2, etiquetas=1, seed=4)
+    uno = generar_rf626a(tmp_path / "b" / "uno.pdf", paginas=1, etiquetas=1, filas=3, columnas=1, seed=3)
+
+    res = convertir_pdf.process_pdf(tmp_path / "a" / "dos.pdf", out)
+    assert _lineas(res[3]) == dos
+    col = plantillas.abrir(out)
+    guardado = dict(col.datos["RF626A|950x792"])
+
+    with fitz.open(tmp_path / "b" / "uno.pdf") as doc:
+        page = doc[0]
+        words = page.get_text("words")
+        split_x = col.split_x("RF626A", page, words, tolerancia_y(words))
+        mitad = float(page.rect.width) / 2.0
+    assert split_x == guardado["split_x"] != mitad
+
+    res = convertir_pdf.process_pdf(tmp_path / "b" / "uno.pdf", out)
+    assert _lineas(res[3]) == uno
+    assert col.datos["RF626A|950x792"] == guardado
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cli
+from catalogo import abrir as abrir_catalogo
+from exportar import exportar_lote
+from lote import Fusion, procesar_lote, registro_arg, resolve_workers, workers_arg
+from registro import Registro
+
+# Modo demonio: las tiendas dejan RF625A/RF626A en una carpeta compartida y
+# esto los va procesando según llegan (mismo process_pdf que el resto).
+ESTABLE_SEG = 1.0   # tamaño+fecha sin cambiar durante esto = PDF terminado de copiar
+POLL_SEG = 2.0      # intervalo del modo polling (y espera máxima con inotify)
+DEBOUNCE_SEG = 0.5  # juntar llegadas seguidas en un solo lote
+MAX_LOTE = 64
+REINTENTO_SEG = 30.0  # un lote que falló (cerrojo, sqlite...) se reintenta tras esto
+
+# ---------- detección de archivos nuevos ----------
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+class _Inotify:
+    """inotify por ctypes (solo Linux, sin dependencias)."""
+    def __init__(self, carpeta: Path):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(str(carpeta)), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch {carpeta}")
+        self.carpeta = carpeta
+
+    def esperar(self, timeout: float):
+        """Nombres con eventos (puede volver vacío por timeout)."""
+        import select
+        import struct
+
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return set()
+        nombres, buf = set(), os.read(self.fd, 64 * 1024)
+        i = 0
+        while i + 16 <= len(buf):
+            _, _, _, n = struct.unpack_from("iIII", buf, i)
+            nombre = buf[i + 16 : i + 16 + n].rstrip(b"\0")
+            if nombre:
+                nombres.add(self.carpeta / os.fsdecode(nombre))
+            i += 16 + n
+        return nombres
+
+    def close(self):
+        os.close(self.fd)
+
+class _Polling:
+    """Fallback: Windows, macOS, carpetas de red (inotify no ve escrituras remotas)."""
+    def __init__(self, carpeta: Path):
+        self.carpeta = carpeta
+
+    def esperar(self, timeout: float):
+        time.sleep(timeout)
+        return set(pdfs_en(self.carpeta))
+
+    def close(self):
+        pass
+
+def pdfs_en(carpeta: Path):
+    return [p for p in carpeta.iterdir() if p.is_file() and p.suffix.lower() == ".pdf"]
+
+def abrir_detector(carpeta: Path, polling: bool):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return _Inotify(carpeta)
+        except OSError as e:
+            print(f"⚠️  inotify no disponible ({e}), uso polling", file=sys.stderr)
+    return _Polling(carpeta)
+
+# ---------- archivos "terminados" ----------
+class Estabilidad:
+    """
+    Un PDF está listo cuando su (tamaño, mtime) no cambia durante ESTABLE_SEG
+    y se puede abrir para leer (en Windows falla mientras otro proceso escribe).
+    """
+    def __init__(self, estable_seg: float = ESTABLE_SEG):
+        self.estable_seg = estable_seg
+        self.vistos = {}      # path -> ((size, mtime_ns), desde)
+        self.hechos = set()   # (path, size, mtime_ns) ya entregados (rechazos incluidos)
+
+    def observar(self, paths):
+        ahora = time.monotonic()
+        for p in paths:
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                self.vistos.pop(p, None)
+                continue
+            firma = (st.st_size, st.st_mtime_ns)
+            if (p, *firma) in self.hechos:
+                continue
+            previo = self.vistos.get(p)
+            if previo is None or previo[0] != firma:
+                self.vistos[p] = (firma, ahora)
+
+    def listos(self):
+        ahora = time.monotonic()
+        out = []
+        for p, (firma, desde) in list(self.vistos.items()):
+            if ahora - desde < self.estable_seg or firma[0] == 0:
+                continue
+            try:
+                with open(p, "rb"):
+                    pass
+            except OSError:
+                continue
+            out.append(p)
+            del self.vistos[p]
+            self.hechos.add((p, *firma))
+        return sorted(out)
+
+    def pendientes(self) -> bool:
+        return bool(self.vistos)
+
+    def reintentar(self, paths, espera: float):
+        """PDFs de un lote que falló (otra vez en la entrada): listos de nuevo pasada `espera`."""
+        paths = set(paths)
+        self.hechos = {h for h in self.hechos if h[0] not in paths}
+        desde = time.monotonic() + espera
+        for p in paths:
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            self.vistos[p] = ((st.st_size, st.st_mtime_ns), desde)
+
+# ---------- workers ----------
+def _calentar():
+    # una vez por worker: fitz y los parsers quedan importados para todos los PDFs
+    import fitz  # noqa: F401  PyMuPDF
+    import despachador  # noqa: F401  (importa cajas_azules y convertir_pdf)
+
+def vigilar(inbox: Path, out_root: Path, formato="auto", workers=1, salida="etiqueta",
+            force=False, polling=False, page_workers=1, emitir=print, metricas=None, diagnostico=False,
+            memoria_acotada=False, por_pdf=False, incremental=False, exportar=False):
+    # cada lote junta sus etiquetas repetidas (lote.Fusion) salvo --por-pdf
+    diferir = not por_pdf and not memoria_acotada
+    proc, version = cli.preparar(formato, {}, page_workers, salida, metricas, diagnostico, memoria_acotada, diferir,
+                                 incremental)
+    fusion = Fusion(incremental, metricas) if diferir else None
+    registro = Registro(out_root, version)
+    catalogo = abrir_catalogo(out_root)
+    detector = abrir_detector(inbox, polling)
+    estab = Estabilidad()
+    workers = max(1, workers)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_calentar) as ex:
+        # arrancar los workers ya, no con el primer PDF
+        for f in [ex.submit(_calentar) for _ in range(workers)]:
+            f.result()
+
+        estab.observar(pdfs_en(inbox))  # lo que ya estaba en la carpeta
+        try:
+            while True:
+                timeout = DEBOUNCE_SEG if estab.pendientes() else POLL_SEG
+                estab.observar(detector.esperar(timeout))
+                lote = estab.listos()[:MAX_LOTE]
+                if not lote:
+                    continue
+                escritas, emitidos = [], set()
+                try:
+                    for pdf, res, saltado in procesar_lote(
+                        proc, lote, out_root, workers, registro, force, executor=ex, fusion=fusion
+                    ):
+                        r = cli.normalizar(pdf, res, saltado)
+                        if r["ok"] and not saltado:
+                            escritas += r["dbs"]
+                        emitir(json.dumps(r, ensure_ascii=False))
+                        emitidos.add(pdf)
+                    # con los resultados ya registrados y emitidos: si esto falla, los
+                    # PDFs están hechos (catalogo.py sincronizar / exportar.py lo ponen al día)
+                    catalogo.actualizar(dict.fromkeys(escritas))
+                    if exportar:
+                        exportar_lote(out_root, escritas)
+                except Exception as e:
+                    # un lote que falla (cerrojo ocupado, sqlite, export...) no para el
+                    # demonio: los PDFs que siguen en la entrada se reintentan
+                    reason = f"lote: {type(e).__name__}: {e}"
+                    for pdf in lote:
+                        if pdf not in emitidos:
+                            emitir(json.dumps({"ok": False, "pdf": pdf.name, "reason": reason,
+                                               "reintento": pdf.exists()}, ensure_ascii=False))
+                    print(f"⚠️  {reason}", file=sys.stderr)
+                    estab.reintentar([p for p in lote if p.exists()], REINTENTO_SEG)
+        finally:
+            detector.close()
+            registro.close()
+            catalogo.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vigila una carpeta y procesa los PDFs que llegan")
+    parser.add_argument("inbox", type=Path, help="carpeta donde las tiendas dejan los PDFs")
+    parser.add_argument("-o", "--out", type=Path, required=True, help="carpeta raíz de salida")
+    parser.add_argument("--formato", choices=cli.FORMATOS, default="auto")
+    parser.add_argument("--salida", choices=("etiqueta", "dia", "ambos"), default="etiqueta")
+    parser.add_argument("--polling", action="store_true", help="no usar inotify (carpetas de red)")
+    cli.metricas_arg(parser)
+    cli.memoria_arg(parser)
+    cli.fusion_arg(parser)
+    cli.incremental_arg(parser)
+    cli.exportar_arg(parser)
+    workers_arg(parser)
+    registro_arg(parser)
+    args = parser.parse_args(argv)
+
+    if not args.inbox.is_dir():
+        print(f"error: {args.inbox} no es una carpeta", file=sys.stderr)
+        return cli.EXIT_USO
+    try:
+        vigilar(
+            args.inbox, args.out, args.formato, resolve_workers(args.workers), args.salida,
+            args.force, args.polling, resolve_workers(args.page_workers),
+            emitir=lambda s: print(s, flush=True), metricas=args.metricas,
+            diagnostico=args.diagnostico, memoria_acotada=args.memoria_acotada, por_pdf=args.por_pdf,
+            incremental=args.incremental, exportar=args.exportar,
+        )
+    except KeyboardInterrupt:
+        pass
+    return cli.EXIT_OK
+
+if __name__ == "__main__":
+    raise SystemExit(main())